@@ -0,0 +1,156 @@
+"""Micro-benchmark of streaming DataMessage decoding.
+
+Compares header decoding of `saxobank.streaming_session.DataMessage` against
+the previous implementation which re-sliced the frame on every property access.
+
+Usage:
+    python -m benchmarks.bench_data_message
+"""
+import json
+import struct
+import timeit
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Literal
+
+from saxobank.streaming_session import DataMessage
+
+
+@dataclass(frozen=True)
+class _DataMessageLayout:
+    INDEX: int
+    SIZE: int
+
+
+class LegacyDataMessage:
+    __LAYOUT_MESSAGE_ID = _DataMessageLayout(0, 8)
+    __LAYOUT_REF_ID_SIZE = _DataMessageLayout(10, 1)
+    __LAYOUT_REF_ID = _DataMessageLayout(11, 0)
+    __LAYOUT_PAYLOAD_FORMAT = _DataMessageLayout(11, 1)
+    __LAYOUT_PAYLOAD_SIZE = _DataMessageLayout(12, 4)
+    __LAYOUT_PAYLOAD = _DataMessageLayout(16, 0)
+
+    __BYTEORDER: Literal["little", "big"] = "little"
+
+    def __init__(self, message: bytes) -> None:
+        self.message = message
+
+    @classmethod
+    @lru_cache()
+    def __parse_int(cls, b: bytes) -> int:
+        return int.from_bytes(b, cls.__BYTEORDER)
+
+    @classmethod
+    def __parse_json(cls, b: bytes) -> Any:
+        return json.loads(b.decode("utf-8", "strict"))
+
+    @classmethod
+    @lru_cache()
+    def __parse_str(cls, b: bytes) -> str:
+        return b.decode("ascii", "strict")
+
+    @classmethod
+    def __cut(cls, bytes: bytes, index: int, size: int) -> bytes:
+        return bytes[index : index + size]
+
+    @property
+    def _payload_size(self) -> int:
+        return self.__parse_int(
+            self.__cut(
+                self.message,
+                self.__LAYOUT_PAYLOAD_SIZE.INDEX + self.__reference_id_size,
+                self.__LAYOUT_PAYLOAD_SIZE.SIZE,
+            )
+        )
+
+    @property
+    def __reference_id_size(self) -> int:
+        return self.__parse_int(
+            self.__cut(
+                self.message, self.__LAYOUT_REF_ID_SIZE.INDEX, self.__LAYOUT_REF_ID_SIZE.SIZE
+            )
+        )
+
+    @property
+    def message_id(self) -> int:
+        return self.__parse_int(
+            self.__cut(self.message, self.__LAYOUT_MESSAGE_ID.INDEX, self.__LAYOUT_MESSAGE_ID.SIZE)
+        )
+
+    @property
+    def payload(self) -> Any:
+        return self.__parse_json(
+            self.__cut(
+                self.message,
+                self.__LAYOUT_PAYLOAD.INDEX + self.__reference_id_size,
+                self._payload_size,
+            )
+        )
+
+    @property
+    def _payload_fmt(self) -> int:
+        return self.__parse_int(
+            self.__cut(
+                self.message,
+                self.__LAYOUT_PAYLOAD_FORMAT.INDEX + self.__reference_id_size,
+                self.__LAYOUT_PAYLOAD_FORMAT.SIZE,
+            )
+        )
+
+    @property
+    def reference_id(self) -> str:
+        return self.__parse_str(
+            self.__cut(
+                self.message,
+                self.__LAYOUT_REF_ID.INDEX,
+                self.__LAYOUT_REF_ID.SIZE + self.__reference_id_size,
+            )
+        )
+
+
+def price_frame(message_id: int) -> bytes:
+    ref_id = b"IP44964"
+    body = json.dumps(
+        {
+            "Quote": {"Ask": 1.09863, "Bid": 1.09853, "Mid": 1.09858},
+            "LastUpdated": "2023-09-14T08:31:04.123Z",
+        }
+    ).encode("utf-8")
+    return (
+        struct.pack("<Q2xB", message_id, len(ref_id))
+        + ref_id
+        + struct.pack("<BI", 0, len(body))
+        + body
+    )
+
+
+def header(cls: type, frames: list[bytes]) -> None:
+    for frame in frames:
+        message = cls(frame)
+        message.message_id
+        message.reference_id
+        message._payload_fmt
+        message._payload_size
+
+
+def full(cls: type, frames: list[bytes]) -> None:
+    for frame in frames:
+        message = cls(frame)
+        message.message_id
+        message.reference_id
+        message.payload
+
+
+def main(number: int = 20) -> None:
+    # Message ids differ per frame, so that lru_cache of legacy class can't hide the slicing cost.
+    frames = [price_frame(i) for i in range(10_000)]
+
+    for name, func in (("header", header), ("header+payload", full)):
+        for cls in (LegacyDataMessage, DataMessage):
+            elapsed = min(timeit.repeat(lambda: func(cls, frames), number=number, repeat=3))
+            per_message = elapsed / (number * len(frames)) * 1e9
+            print(f"{name:<16}{cls.__name__:<20}{per_message:10.1f} ns/message")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Benchmark of JSON codecs on chart and price payloads.
+
+Payloads follow the shape of chart/v1/charts responses and trade/v1/prices streaming deltas.
+Codecs not installed are skipped.
+
+Usage:
+    python -m benchmarks.bench_json_codec
+"""
+import json
+import timeit
+from datetime import datetime, timedelta, timezone
+
+from saxobank import codec
+
+
+def chart_payload(count: int = 1200) -> bytes:
+    start = datetime(2023, 9, 14, tzinfo=timezone.utc)
+    samples = [
+        {
+            "CloseAsk": 1.07241 + i * 1e-5,
+            "CloseBid": 1.07231 + i * 1e-5,
+            "HighAsk": 1.07262 + i * 1e-5,
+            "HighBid": 1.07252 + i * 1e-5,
+            "LowAsk": 1.07223 + i * 1e-5,
+            "LowBid": 1.07213 + i * 1e-5,
+            "OpenAsk": 1.07238 + i * 1e-5,
+            "OpenBid": 1.07228 + i * 1e-5,
+            "Time": (start + timedelta(minutes=i)).strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        }
+        for i in range(count)
+    ]
+    return json.dumps(
+        {
+            "ChartInfo": {
+                "ExchangeId": "SBFX",
+                "Horizon": 1,
+                "FirstSampleTime": "2021-09-14T00:00:00.000Z",
+            },
+            "Data": samples,
+            "DataVersion": 1234,
+        }
+    ).encode("utf-8")
+
+
+def price_payload() -> bytes:
+    return json.dumps(
+        {
+            "LastUpdated": "2023-09-14T08:31:04.123Z",
+            "Quote": {"Ask": 1.07263, "Bid": 1.07253, "Mid": 1.07258, "DelayedByMinutes": 0},
+        }
+    ).encode("utf-8")
+
+
+def codecs() -> list[codec.JsonCodec]:
+    available = [codec.STDLIB_CODEC]
+    for factory in (codec.orjson_codec, codec.msgspec_codec):
+        try:
+            available.append(factory())
+        except ImportError:
+            print(f"{factory.__name__} skipped, not installed.")
+    return available
+
+
+def main() -> None:
+    payloads = {
+        "chart(1200)": (memoryview(chart_payload()), 200),
+        "price": (memoryview(price_payload()), 100_000),
+    }
+
+    for name, (payload, number) in payloads.items():
+        for json_codec in codecs():
+            elapsed = min(timeit.repeat(lambda: json_codec.loads(payload), number=number, repeat=3))
+            print(f"{name:<14}{json_codec.name:<10}{elapsed / number * 1e6:12.2f} us/payload")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Memory benchmark of high cardinality models.
+
+Reports bytes per object of slotted models against the previous dataclasses having `__dict__`.
+Field values are shared among objects, so that only the objects themselves are measured.
+
+Usage:
+    python -m benchmarks.bench_model_memory
+"""
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional, Union
+
+from saxobank.model.chart.charts import ChartInfo, ChartSample
+from saxobank.model.common import HeartbeatReason, ReferenceId
+from saxobank.model.streaming import Heartbeats
+
+
+@dataclass
+class LegacyChartSample:
+    CloseAsk: float
+    CloseBid: float
+    Time: Union[datetime, str]
+
+
+@dataclass
+class LegacyChartInfo:
+    ExchangeId: str
+    Horizon: int
+    FirstSampleTime: Optional[datetime] = None
+    DelayedByMinutes: Optional[int] = None
+
+
+@dataclass
+class LegacyHeartbeats:
+    OriginatingReferenceId: ReferenceId
+    Reason: HeartbeatReason
+
+
+def bytes_per_object(factory: Callable[[], Any], count: int) -> float:
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        objects = [factory() for _ in range(count)]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    # Exclude the list holding objects.
+    return (after - before - objects.__sizeof__()) / count
+
+
+def main(count: int = 100_000) -> None:
+    time = datetime(2023, 9, 14, tzinfo=timezone.utc)
+    reference_id = ReferenceId("IP44964")
+    reason = HeartbeatReason.NoNewData
+
+    cases = (
+        (
+            "ChartSample",
+            lambda: LegacyChartSample(1.09863, 1.09853, time),
+            lambda: ChartSample(1.09863, 1.09853, time),
+        ),
+        (
+            "ChartInfo",
+            lambda: LegacyChartInfo("NYSE", 1, time, 15),
+            lambda: ChartInfo("NYSE", 1, time, 15),
+        ),
+        (
+            "Heartbeats",
+            lambda: LegacyHeartbeats(reference_id, reason),
+            lambda: Heartbeats(reference_id, reason),
+        ),
+    )
+    for name, legacy, slotted in cases:
+        before, after = bytes_per_object(legacy, count), bytes_per_object(slotted, count)
+        print(f"{name:<12}{before:8.1f} -> {after:8.1f} bytes/object")
+
+
+if __name__ == "__main__":
+    main()
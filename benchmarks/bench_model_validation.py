@@ -0,0 +1,57 @@
+"""Benchmark of SaxobankModel2 validation with a chart of 1200 samples.
+
+Compares the validator compiled once per class against the previous implementation
+which evaluated annotations and ran typeguard on every instance.
+
+Usage:
+    python -m benchmarks.bench_model_validation
+"""
+import timeit
+from dataclasses import fields
+from datetime import datetime, timedelta, timezone
+from inspect import get_annotations
+from typing import Any
+
+from typeguard import CollectionCheckStrategy, TypeCheckError, check_type
+
+from saxobank.model.base import SaxobankModel2
+from saxobank.model.chart.charts import ChartSample
+
+
+def legacy_post_init(self: Any) -> None:
+    schema = get_annotations(self.__class__, eval_str=True)
+
+    for field in fields(self):
+        name = field.name
+        try:
+            check_type(
+                getattr(self, name),
+                schema[name],
+                collection_check_strategy=CollectionCheckStrategy.ALL_ITEMS,
+            )
+
+        except TypeCheckError:
+            raise ValueError(f"Invalid value of {name}. Expected {schema[name].__name__}.")
+
+
+def main(count: int = 1200, number: int = 20) -> None:
+    start = datetime(2023, 9, 14, tzinfo=timezone.utc)
+    samples = [
+        ChartSample(
+            CloseAsk=1.09 + i * 1e-5, CloseBid=1.08 + i * 1e-5, Time=start + timedelta(minutes=i)
+        )
+        for i in range(count)
+    ]
+
+    for name, validate in (
+        ("legacy", legacy_post_init),
+        ("compiled", SaxobankModel2.__post_init__),
+    ):
+        elapsed = min(
+            timeit.repeat(lambda: [validate(s) for s in samples], number=number, repeat=3)
+        )
+        print(f"{name:<10}{elapsed / number * 1e3:10.2f} ms/{count} samples")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Benchmark of inactivity timeout tracking with 10k subscriptions.
+
+Compares `saxobank.subscription.Subscriptions` against the previous implementation
+which scanned every subscription on heartbeats and on empty reads.
+
+Usage:
+    python -m benchmarks.bench_subscription_timeouts
+"""
+import timeit
+from datetime import datetime, timezone
+from typing import Collection, Set
+
+from saxobank.model.common import ReferenceId
+from saxobank.subscription import Subscription, Subscriptions
+
+
+class LegacySubscriptions:
+    def __init__(self) -> None:
+        self._subscriptions: Set[Subscription] = set()
+
+    def add(self, subscription: Subscription) -> None:
+        self._subscriptions.add(subscription)
+
+    def remove_timeouts(self, evaluate_at: datetime) -> Set[ReferenceId]:
+        timeouts = {s for s in self._subscriptions if s.is_timed_out(evaluate_at)}
+        for subscription in timeouts:
+            self._subscriptions.remove(subscription)
+        return {s.reference_id for s in timeouts}
+
+    def extend_timeout(self, reference_ids: Collection[ReferenceId]) -> None:
+        for subscription in {s for s in self._subscriptions if s.reference_id in reference_ids}:
+            subscription.extend_timeout()
+
+
+def populate(container: object, count: int) -> list[ReferenceId]:
+    reference_ids = [ReferenceId(f"ref{i}") for i in range(count)]
+    for reference_id in reference_ids:
+        subscription = Subscription(reference_id)
+        subscription._setup(60, None)
+        container.add(subscription)
+        subscription.extend_timeout()
+    return reference_ids
+
+
+def main(count: int = 10_000, number: int = 200) -> None:
+    for cls in (LegacySubscriptions, Subscriptions):
+        container = cls()
+        reference_ids = populate(container, count)
+        heartbeat = reference_ids[::100]
+
+        cases = {
+            "heartbeat(100 ids)": lambda: container.extend_timeout(heartbeat),
+            "remove_timeouts": lambda: container.remove_timeouts(datetime.now(timezone.utc)),
+        }
+        for name, func in cases.items():
+            elapsed = min(timeit.repeat(func, number=number, repeat=3))
+            print(f"{name:<20}{cls.__name__:<22}{elapsed / number * 1e6:12.2f} us/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark of Subscriptions lookups with 1k and 10k subscriptions.
+
+Compares `saxobank.subscription.Subscriptions` against the previous implementation
+which kept subscriptions in a set and scanned it on every lookup.
+
+Usage:
+    python -m benchmarks.bench_subscriptions
+"""
+import timeit
+from typing import Optional, Set
+
+from saxobank.model.common import ReferenceId
+from saxobank.subscription import Subscription, Subscriptions
+
+
+class LegacySubscriptions:
+    def __init__(self) -> None:
+        self._subscriptions: Set[Subscription] = set()
+
+    def add(self, subscription: Subscription) -> None:
+        self._subscriptions.add(subscription)
+
+    def discard(self, subscription: Subscription) -> None:
+        self._subscriptions.discard(subscription)
+
+    def get(self, reference_id: ReferenceId) -> Subscription:
+        for s in self._subscriptions:
+            if s.reference_id == reference_id:
+                return s
+        raise KeyError(reference_id)
+
+    def remove_items(self, tag: Optional[str] = None) -> None:
+        for s in {s for s in self._subscriptions if s.tag == tag}:
+            self.discard(s)
+
+
+TAGS = 100
+
+
+def populate(container: object, count: int) -> list[ReferenceId]:
+    reference_ids = [ReferenceId(f"ref{i}") for i in range(count)]
+    for i, reference_id in enumerate(reference_ids):
+        container.add(Subscription(reference_id, tag=f"tag{i % TAGS}"))
+    return reference_ids
+
+
+def main(number: int = 20) -> None:
+    for count in (1_000, 10_000):
+        for cls in (LegacySubscriptions, Subscriptions):
+            container = cls()
+            reference_ids = populate(container, count)
+            # Every 10th subscription receives a data message.
+            messages = reference_ids[::10]
+
+            elapsed = min(
+                timeit.repeat(lambda: [container.get(r) for r in messages], number=number, repeat=3)
+            )
+            print(
+                f"{count:>6} get              {cls.__name__:<22}{elapsed / (number * len(messages)) * 1e9:12.1f} ns/call"
+            )
+
+            # Each tag is removed once from the same container, averaged while it shrinks to empty.
+            tags = iter([f"tag{i}" for i in range(TAGS)])
+            elapsed = (
+                sum(
+                    timeit.repeat(
+                        lambda: container.remove_items(tag=next(tags)), number=1, repeat=TAGS
+                    )
+                )
+                / TAGS
+            )
+            print(f"{count:>6} remove_items(tag) {cls.__name__:<22}{elapsed * 1e6:12.1f} us/call")
+
+
+if __name__ == "__main__":
+    main()
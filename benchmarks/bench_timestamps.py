@@ -0,0 +1,28 @@
+"""Benchmark of timestamp parsing of chart samples.
+
+Compares `saxobank.model.base.parse_timestamp` and its vectorized variant `parse_timestamps`
+against `ommit_datetime_zero` which was used for every sample.
+
+Usage:
+    python -m benchmarks.bench_timestamps
+"""
+import timeit
+
+from saxobank.model.base import ommit_datetime_zero, parse_timestamp, parse_timestamps
+
+
+def main(count: int = 10_000, number: int = 20) -> None:
+    timestamps = [f"2023-09-14T{i // 60 % 24:02d}:{i % 60:02d}:00.000Z" for i in range(count)]
+
+    cases = {
+        "ommit_datetime_zero": lambda: [ommit_datetime_zero(t) for t in timestamps],
+        "parse_timestamp": lambda: [parse_timestamp(t) for t in timestamps],
+        "parse_timestamps": lambda: parse_timestamps(timestamps),
+    }
+    for name, func in cases.items():
+        elapsed = min(timeit.repeat(func, number=number, repeat=3))
+        print(f"{name:<22}{elapsed / (number * count) * 1e9:10.1f} ns/timestamp")
+
+
+if __name__ == "__main__":
+    main()
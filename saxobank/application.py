@@ -4,13 +4,13 @@ import logging
 from functools import partialmethod
 from typing import Coroutine, Optional, Tuple, cast
 
-import simplejson
 from aiohttp import ClientSession
 from attr import dataclass
 
 import saxobank
 
 from . import endpoint, model
+from .codec import JsonCodec, default_codec
 from .environment import LIVE, SIM, SaxobankEnvironment, WsBaseUrl
 from .model import chart, req
 from .model.base import SaxobankModel
@@ -18,6 +18,7 @@ from .model.common import ContextId, ResponseCode
 
 # from .streaming_session import StreamingSession
 from .user_session import RateLimiter, UserSession, _OpenApiRequestResponse
+from .validation import STRICT_VALIDATION, ValidationPolicy
 
 # from environment import Environment
 
@@ -30,11 +31,15 @@ class Application:
         saxobank_environment: SaxobankEnvironment,
         application_key,
         application_secret,
+        json_codec: Optional[JsonCodec] = None,
+        validation_policy: Optional[ValidationPolicy] = None,
     ):
         self.saxo_env = saxobank_environment
         self.__app_key = application_key
         self.__app_secret = application_secret
         self.limiter = RateLimiter()
+        self.codec = json_codec if json_codec else default_codec()
+        self.validation_policy = validation_policy if validation_policy else STRICT_VALIDATION
 
     @classmethod
     def LIVE(cls, application_key, application_secret):
@@ -45,9 +50,14 @@ class Application:
         return cls(SIM, application_key, application_secret)
 
     def create_session(self, access_token: Optional[str] = None) -> SessionFacade:
-        client_session = ClientSession(json_serialize=simplejson.dumps)
+        client_session = ClientSession(json_serialize=self.codec.dumps)
         user_session = UserSession(
-            self.saxo_env.rest_base_url, client_session, self.limiter, access_token
+            self.saxo_env.rest_base_url,
+            client_session,
+            self.limiter,
+            access_token,
+            self.codec,
+            self.validation_policy,
         )
         # return SessionFacade(rest_base_url, ws_base_url, access_token)
         return Client(user_session, self.saxo_env.ws_base_url)
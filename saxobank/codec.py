@@ -0,0 +1,131 @@
+"""JSON codecs used for REST bodies and streaming payloads.
+
+Codec is chosen once when `saxobank.application.Application` or
+`saxobank.streaming_session.StreamingSession` is built, then shared by every request and data message.
+Third-party decoders working directly on bytes (orjson, msgspec) are optional and
+`default_codec` falls back to the standard library if none of them is installed.
+
+Encoding always uses simplejson, which writes `decimal.Decimal` amounts of orders as exact numbers.
+
+Streaming payloads in protobuf format are decoded by `protobuf_decoder` into the same dict shape as JSON payloads.
+"""
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from datetime import timezone
+from typing import Any, Callable, Union, cast
+
+import simplejson
+
+Buffer = Union[bytes, bytearray, memoryview, str]
+
+
+@dataclass(frozen=True)
+class JsonCodec:
+    """Pair of JSON decoder and encoder.
+
+    Attributes:
+        name: Name of the codec.
+        loads: Decode JSON document given as bytes, memoryview or str.
+        dumps: Encode object to JSON str.
+    """
+
+    name: str
+    loads: Callable[[Buffer], Any]
+    dumps: Callable[[Any], str] = simplejson.dumps
+
+
+def _stdlib_loads(b: Buffer) -> Any:
+    # json.loads accepts bytes but not memoryview, decode it without copying to bytes first.
+    return json.loads(str(b, "utf-8") if isinstance(b, memoryview) else b)
+
+
+STDLIB_CODEC = JsonCodec("json", _stdlib_loads)
+
+
+def orjson_codec() -> JsonCodec:
+    """Codec decoding with orjson.
+
+    Raises:
+        ImportError: orjson is not installed.
+    """
+    import orjson
+
+    return JsonCodec("orjson", orjson.loads)
+
+
+def msgspec_codec() -> JsonCodec:
+    """Codec decoding with msgspec.
+
+    Raises:
+        ImportError: msgspec is not installed.
+    """
+    import msgspec
+
+    return JsonCodec("msgspec", msgspec.json.Decoder().decode)
+
+
+def default_codec() -> JsonCodec:
+    """Fastest codec available, standard library if neither orjson nor msgspec is installed."""
+    for factory in (orjson_codec, msgspec_codec):
+        try:
+            return factory()
+        except ImportError:
+            continue
+    return STDLIB_CODEC
+
+
+def _is_repeated(field: Any) -> bool:
+    # is_repeated was added to field descriptors by recent protobuf releases, which dropped label.
+    try:
+        return cast(bool, field.is_repeated)
+    except AttributeError:
+        return cast(bool, field.label == field.LABEL_REPEATED)
+
+
+def _message_to_dict(message: Any) -> dict[str, Any]:
+    # Unlike json_format.MessageToDict, keep int64 as int and Timestamp as datetime so that
+    # decoded payloads go through the same models as JSON ones.
+    decoded: dict[str, Any] = {}
+    for field, value in message.ListFields():
+        if field.message_type is not None:
+            if field.message_type.full_name == "google.protobuf.Timestamp":
+                convert = lambda v: v.ToDatetime(tzinfo=timezone.utc)  # noqa: E731
+            else:
+                convert = _message_to_dict
+        elif field.enum_type is not None:
+            convert = lambda v, enum=field.enum_type: enum.values_by_number[v].name  # noqa: E731
+        else:
+            convert = None
+
+        if _is_repeated(field):
+            decoded[field.name] = [convert(v) for v in value] if convert else list(value)
+        else:
+            decoded[field.name] = convert(value) if convert else value
+    return decoded
+
+
+def protobuf_decoder(message_class: type) -> Callable[[Buffer], Any]:
+    """Decoder of protobuf payloads of a subscription.
+
+    Saxobank delivers the schema of protobuf payloads with subscription response,
+    message class is supposed to be generated from it by protoc.
+
+    Args:
+        message_class: Generated protobuf message class of subscription payload.
+
+    Returns:
+        Decoder returning dict keyed by field names, only fields present on the wire are contained.
+
+    Raises:
+        ImportError: protobuf is not installed.
+    """
+    import google.protobuf  # noqa: F401
+
+    def loads(b: Buffer) -> Any:
+        message = message_class()
+        message.ParseFromString(b)
+        return _message_to_dict(message)
+
+    return loads
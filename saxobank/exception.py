@@ -38,6 +38,52 @@ class SubscriptionPermanentlyDisabledError(StreamingError):
         return f"Subscription of Reference ID {self.reference_ids} will be unavailable."
 
 
+class SubscriptionRecreationError(StreamingError):
+    def __init__(self, reference_ids: Set[ReferenceId]) -> None:
+        self.reference_ids = reference_ids
+
+    def __str__(self) -> str:
+        return f"Subscription of Reference ID {self.reference_ids} failed to re-create, will be retried."
+
+
+class StreamingConnectionLostError(StreamingError):
+    def __str__(self) -> str:
+        return "Connection of streaming was lost. Need to connect again."
+
+
+class UnsupportedPayloadFormatError(StreamingError):
+    def __init__(self, reference_id: ReferenceId, payload_format: int) -> None:
+        self.reference_id = reference_id
+        self.payload_format = payload_format
+
+    def __str__(self) -> str:
+        return f"Payload format {self.payload_format} of Reference ID {self.reference_id} has no decoder."
+
+
+class InvalidPartitionError(StreamingError):
+    def __init__(
+        self, reference_id: ReferenceId, partition_number: int, total_partition: int
+    ) -> None:
+        self.reference_id = reference_id
+        self.partition_number = partition_number
+        self.total_partition = total_partition
+
+    def __str__(self) -> str:
+        return (
+            f"Partition {self.partition_number} of Reference ID {self.reference_id} "
+            f"is out of {self.total_partition} partitions."
+        )
+
+
+class TruncatedDataMessageError(StreamingError):
+    def __init__(self, offset: int, frame_size: int) -> None:
+        self.offset = offset
+        self.frame_size = frame_size
+
+    def __str__(self) -> str:
+        return f"Data message at offset {self.offset} runs past the end of frame of {self.frame_size} bytes."
+
+
 class StreamingDisconnectError(StreamingError):
     def __str__(self) -> str:
         return f"Stream was disconnected. Client may reset password. Need to authorize again and recreate subscriptions."
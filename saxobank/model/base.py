@@ -4,31 +4,44 @@ You can override classes in the modules and make new data models.
 But models are strongly bundled with Endpoint definitions(endpoint.py),
 thus, createing models by user-side is not supposed to.
 """
+import sys
 from collections import namedtuple
-from dataclasses import dataclass, fields
-from datetime import datetime
+from copy import copy
+from dataclasses import fields, is_dataclass
+from datetime import datetime, timezone
 from enum import Enum
 from inspect import get_annotations
-from types import GenericAlias
+from types import GenericAlias, UnionType
 from typing import (
+    TYPE_CHECKING,
     Any,
+    Callable,
     ClassVar,
     Container,
     Final,
+    Hashable,
     Iterator,
     Literal,
+    NoReturn,
     Optional,
     Sequence,
     Type,
+    Union,
     cast,
+    get_args,
+    get_origin,
     get_type_hints,
 )
 from urllib.parse import parse_qs, urlparse
 
+if TYPE_CHECKING:
+    import numpy as np
+
 from pydantic import BaseModel, ConfigDict, Field, HttpUrl, RootModel
 from typeguard import CollectionCheckStrategy, TypeCheckError, check_type
 
 from .. import exception
+from ..validation import current_validation_policy
 from .common import ContextId, InlineCountValue, OrderDurationType, ReferenceId
 
 
@@ -48,9 +61,188 @@ def ommit_datetime_zero(dt: str) -> datetime:
     return datetime.fromisoformat(dt)
 
 
-@dataclass
+if sys.version_info >= (3, 11):
+    _fromisoformat = datetime.fromisoformat
+else:
+
+    def _fromisoformat(dt: str) -> datetime:
+        return datetime.fromisoformat(dt[:-1] + "+00:00" if dt.endswith("Z") else dt)
+
+
+def parse_timestamp(dt: str) -> datetime:
+    """Parse timestamp of Saxobank, e.g. "2023-09-14T08:31:04.123Z".
+
+    Returns:
+        Aware datetime, in UTC if timestamp has no offset.
+    """
+    parsed = _fromisoformat(dt)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def format_timestamp(dt: datetime) -> str:
+    """Format datetime as Saxobank does, e.g. "2023-09-14T08:31:04.123Z", naive one is taken as UTC."""
+    utc = dt.astimezone(timezone.utc) if dt.tzinfo else dt
+    return f"{utc:%Y-%m-%dT%H:%M:%S}.{utc.microsecond // 1000:03d}Z"
+
+
+def parse_timestamps(dts: Sequence[str]) -> "np.ndarray":
+    """Parse timestamps of Saxobank into datetime64[ms] array in UTC.
+
+    Timestamps of the same length ending with "Z", as Saxobank sends them, are parsed
+    by NumPy at once from a buffer of fixed width strings.
+
+    Raises:
+        ImportError: numpy is not installed.
+    """
+    import numpy as np
+
+    widths = set(map(len, dts))
+    width = widths.pop() if len(widths) == 1 else 0
+    joined = "".join(dts) if 1 < width else ""
+    if joined and joined.isascii():
+        fixed = np.frombuffer(joined.encode("ascii"), dtype=f"S{width}")
+        if (fixed.view(np.uint8)[width - 1 :: width] == ord("Z")).all():
+            # Truncating the width drops "Z", which NumPy doesn't parse.
+            return fixed.astype(f"S{width - 1}").astype("datetime64[ms]")
+
+    return np.array([dt[:-1] if dt.endswith("Z") else dt for dt in dts], dtype="datetime64[ms]")
+
+
+_Check = Callable[[Any], bool]
+
+
+def _type_name(hint: Any) -> str:
+    return getattr(hint, "__name__", None) or repr(hint)
+
+
+def _typeguard_check(hint: Any) -> _Check:
+    # Fallback for type-hints not compiled, checked by typeguard as they were.
+    def check(value: Any) -> bool:
+        try:
+            check_type(value, hint, collection_check_strategy=CollectionCheckStrategy.ALL_ITEMS)
+        except TypeCheckError:
+            return False
+        return True
+
+    return check
+
+
+def _plain_types(hint: Any) -> Optional[tuple[type, ...]]:
+    # Types of isinstance check equivalent to the hint, None if it needs more than that.
+    if hint is type(None) or hint is None:
+        return (type(None),)
+    if hint is float:
+        # int is acceptable for float, as typeguard does.
+        return (int, float)
+    if isinstance(hint, type) and not get_args(hint) and get_origin(hint) is None:
+        return (hint,)
+    if get_origin(hint) in (Union, UnionType):
+        types = [_plain_types(arg) for arg in get_args(hint)]
+        if all(t is not None for t in types):
+            return tuple(t for ts in cast(list[tuple[type, ...]], types) for t in ts)
+    return None
+
+
+def _compile_check(hint: Any) -> _Check:
+    """Compile type-hint into a check specialized for it.
+
+    Plain classes and unions of them are checked by a single isinstance,
+    Literal by a lookup table and collections item by item.
+    Other type-hints are checked by typeguard.
+    """
+    if hint is Any:
+        return lambda value: True
+
+    types = _plain_types(hint)
+    if types is not None:
+        return lambda value: isinstance(value, types)
+
+    origin, args = get_origin(hint), get_args(hint)
+
+    if origin in (Union, UnionType):
+        checks = [_compile_check(arg) for arg in args]
+        return lambda value: any(check(value) for check in checks)
+
+    if origin is Literal:
+        try:
+            table = frozenset(args)
+        except TypeError:
+            return _typeguard_check(hint)
+        return lambda value: isinstance(value, Hashable) and value in table
+
+    if origin in (list, set, frozenset) and len(args) == 1:
+        check_item = _compile_check(args[0])
+        return lambda value: isinstance(value, origin) and all(check_item(v) for v in value)
+
+    if origin is dict and len(args) == 2:
+        check_key, check_value = _compile_check(args[0]), _compile_check(args[1])
+        return lambda value: isinstance(value, dict) and all(
+            check_key(k) and check_value(v) for k, v in value.items()
+        )
+
+    return _typeguard_check(hint)
+
+
+def _schema(cls: type) -> dict[str, Any]:
+    # String annotations are evaluated once per class, including ones of base classes.
+    schema: dict[str, Any] = {}
+    for klass in reversed(cls.__mro__):
+        if is_dataclass(klass):
+            schema.update(get_annotations(klass, eval_str=True))
+    return schema
+
+
+def _compile_validator(cls: type) -> list[tuple[str, _Check, Any]]:
+    schema = _schema(cls)
+    return [(f.name, _compile_check(schema[f.name]), schema[f.name]) for f in fields(cls)]
+
+
+_VALIDATORS: dict[type, list[tuple[str, _Check, Any]]] = {}
+
+
+def _validator(cls: type) -> list[tuple[str, _Check, Any]]:
+    validator = _VALIDATORS.get(cls)
+    if validator is None:
+        validator = _VALIDATORS[cls] = _compile_validator(cls)
+    return validator
+
+
+def _nested_model(hint: Any) -> Optional[tuple[type, bool]]:
+    # Model class held by a field, and whether the field is a list of them.
+    for arg in get_args(hint) if get_origin(hint) in (Union, UnionType) else (hint,):
+        if isinstance(arg, type) and issubclass(arg, SaxobankModel2):
+            return arg, False
+        row = get_args(arg)
+        if (
+            get_origin(arg) is list
+            and row
+            and isinstance(row[0], type)
+            and issubclass(row[0], SaxobankModel2)
+        ):
+            return row[0], True
+    return None
+
+
+_NESTED_MODELS: dict[type, dict[str, tuple[type, bool]]] = {}
+
+
+def _nested_models(cls: type) -> dict[str, tuple[type, bool]]:
+    nested = _NESTED_MODELS.get(cls)
+    if nested is None:
+        schema = _schema(cls)
+        found = {f.name: _nested_model(schema[f.name]) for f in fields(cls)}
+        nested = _NESTED_MODELS[cls] = {k: v for k, v in found.items() if v is not None}
+    return nested
+
+
 class SaxobankModel2:
+    # Let subclasses of high cardinality be slotted, e.g. charts.ChartSample.
+    # Not a dataclass itself, so that subclasses may be frozen ones, e.g. charts.GetResp.
+    __slots__ = ()
+
     _url_route: ClassVar[set[str]] = set()
+    # Field keying rows in list fields of other models, e.g. "Time" of charts.ChartSample.
+    _list_key: ClassVar[Optional[str]] = None
 
     def routes(self) -> dict[str, Any]:
         return {f.name: getattr(self, f.name) for f in fields(self) if f.name in self._url_route}
@@ -58,24 +250,23 @@ class SaxobankModel2:
     def __post_init__(self) -> None:
         """Called by dataclass init method, then validate data.
 
-        Validation run by type-hints marked on fields of dataclass.
+        Validation run by type-hints marked on fields of dataclass,
+        compiled once per class by `_compile_validator`.
+        It's skipped or sampled according to `saxobank.validation.current_validation_policy`.
 
-        Raises: ValueError: Value is not comply with type-hints.
+        Raises: ValueError: Value is not comply with type-hints, in strict validation level.
         """
-
-        schema = get_annotations(self.__class__, eval_str=True)
-
-        for field in fields(self):
-            name = field.name
-            try:
-                check_type(
-                    getattr(self, name),
-                    schema[name],
-                    collection_check_strategy=CollectionCheckStrategy.ALL_ITEMS,
+        cls = self.__class__
+        policy = current_validation_policy()
+        if not policy.should_validate(cls):
+            return
+
+        for name, check, hint in _validator(cls):
+            if not check(getattr(self, name)):
+                policy.fail(
+                    self, ValueError(f"Invalid value of {name}. Expected {_type_name(hint)}.")
                 )
-
-            except TypeCheckError:
-                raise ValueError(f"Invalid value of {name}. Expected {schema[name].__name__}.")
+                return
 
             # t = schema[field.name]
             # v = getattr(self, field.name)
@@ -86,6 +277,79 @@ class SaxobankModel2:
             # else:
             #     _checkinstance(field.name, v, t)
 
+    def merge(
+        self, delta: Any, changes: Any = None, path: tuple[str, ...] = ()
+    ) -> "SaxobankModel2":
+        """Model with fields of delta merged.
+
+        Delta is a model of the same class or a decoded JSON dict,
+        None values and unknown keys are ignored.
+        Nested models are merged recursively, and decoded JSON of them is built into models.
+        Rows of list fields are merged by `merge_rows`.
+        Changed values of dict delta are validated as construction does.
+
+        Unchanged fields are shared with self,
+        and self is never modified so that it stays valid for its holders.
+
+        Args:
+            changes: Change set to record paths of changed fields and keys of merged rows into,
+                e.g. saxobank.subscription.ChangeSet.
+            path: Path of self in the whole snapshot, prefixed to recorded paths.
+
+        Returns:
+            New model, or self if delta changes nothing.
+        """
+        cls = self.__class__
+        is_dict = isinstance(delta, dict)
+        items = (
+            delta.items() if is_dict else ((f.name, getattr(delta, f.name)) for f in fields(delta))
+        )
+        nested = _nested_models(cls)
+
+        changed = {}
+        for name, value in items:
+            if value is None or name not in cls.__dataclass_fields__:
+                continue
+            base = getattr(self, name)
+            model, is_list = nested.get(name, (None, False))
+            if is_list and isinstance(value, list):
+                rows = [model(**row) if isinstance(row, dict) else row for row in value]
+                value = (
+                    merge_rows(base, rows, changes)
+                    if isinstance(base, list)
+                    else ReadOnlyList(rows)
+                )
+            elif isinstance(base, SaxobankModel2) and isinstance(value, (SaxobankModel2, dict)):
+                # Nested model records paths of its own fields.
+                value = base.merge(value, changes, path + (name,))
+                if value is not base:
+                    changed[name] = value
+                continue
+            elif model is not None and isinstance(value, dict):
+                value = model(**value)
+            if value is not base:
+                changed[name] = value
+                if changes is not None:
+                    changes.paths.add(path + (name,))
+
+        if not changed:
+            return self
+
+        policy = current_validation_policy()
+        if is_dict and policy.should_validate(cls):
+            for name, check, hint in _validator(cls):
+                if name in changed and not check(changed[name]):
+                    error = ValueError(f"Invalid value of {name}. Expected {_type_name(hint)}.")
+                    policy.fail(self, error)
+                    break
+
+        # Shallow copy skips __post_init__, values are validated already.
+        # Set through object, as the model may be a frozen dataclass.
+        new = copy(self)
+        for name, value in changed.items():
+            object.__setattr__(new, name, value)
+        return new
+
 
 class SaxobankRootModel2(Sequence[SaxobankModel2]):
     """Base class of all list type Saxobank request parameters, response or their composits.
@@ -142,6 +406,12 @@ class SaxobankModel(BaseModel):
             return False
         return hash(self) == hash(o)
 
+    def model_post_init(self, __context: Any) -> None:
+        # Model is frozen, its lists are made read-only as well so that sharing it is safe.
+        for name, value in self.__dict__.items():
+            if type(value) is list:
+                object.__setattr__(self, name, ReadOnlyList(value))
+
     # config of frozen=True will automatically generates it and makes model hashable.
     # def __hash__(self) -> int:
     #     return hash(id(self))
@@ -162,29 +432,161 @@ class SaxobankModel(BaseModel):
         return super().dict(**kwargs)
 
     def merge(self, delta) -> "SaxobankModel":
-        new = self.dict(exclude_unset=True)
-        for key, value in delta.dict().items():
-            # if isinstance(value, SaxobankModel):
-            print(f"processing key:{key} and value:{value}")
+        """Model with fields set on delta merged.
+
+        Only fields set on delta are visited, the others are shared with self without being copied.
+        Models are frozen, so that sharing them is safe.
+
+        Returns:
+            New model, or self if delta changes nothing.
+        """
+        changes = {}
+        for key in delta.model_fields_set:
             delta_field = getattr(delta, key)
-            if isinstance(delta_field, SaxobankModel):
-                if hasattr(self, key):
-                    new[key] = getattr(self, key).merge(delta_field)
-                else:
-                    new[key] = delta_field
-            elif isinstance(delta_field, list):
-                if hasattr(self, key):
-                    new[key] = list(set(getattr(self, key)) | set(delta_field))
-                else:
-                    new[key] = delta_field
-                # if hasattr(self, key):
-                #     base_field = getattr(self, key)
-                #     for inner in delta_field:
-                #         if inner in base_field:
-            elif value is not None:
-                new[key] = value
-
-        return self.__class__(**new)
+            base_field = getattr(self, key, None)
+            if isinstance(delta_field, SaxobankModel) and isinstance(base_field, SaxobankModel):
+                changes[key] = base_field.merge(delta_field)
+            elif isinstance(delta_field, list) and isinstance(base_field, list):
+                changes[key] = merge_rows(base_field, delta_field)
+            elif delta_field is not None:
+                changes[key] = delta_field
+
+        return self.model_copy(update=changes) if changes else self
+
+
+class SaxobankListItemModel(SaxobankModel):
+    """Row of list snapshot, e.g. a position of positions subscription.
+
+    Deltas of list snapshot carry changed rows only, merged into the row of the same `_list_key` value.
+    Row marked with `__meta_deleted` is removed from the snapshot.
+    """
+
+    _list_key: ClassVar[str]
+
+    meta_deleted: Optional[bool] = Field(None, alias="__meta_deleted")
+
+
+class ReadOnlyList(list):
+    """List which can't be modified, rows of snapshots shared with consumers.
+
+    It's still a list, so that it's validated, compared and serialized as a list.
+    Copy it, e.g. `list(rows)`, to get a modifiable one.
+    """
+
+    __slots__ = ()
+
+    def _readonly(self, *args: Any, **kwargs: Any) -> NoReturn:
+        raise TypeError(f"{self.__class__.__name__} can't be modified.")
+
+    append = extend = insert = remove = pop = clear = sort = reverse = _readonly
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly
+
+    def __reduce_ex__(self, protocol: Any) -> tuple[Any, ...]:
+        # Default one of list extends an empty instance, which is refused.
+        return ReadOnlyList, (list(self),)
+
+
+class _KeyedRows(ReadOnlyList):
+    # List of rows keeping the position of each key, reused by the following deltas.
+    __slots__ = ("positions",)
+
+    positions: dict[Any, int]
+
+
+def merge_keyed_rows(
+    rows: list[Any],
+    delta_rows: list[Any],
+    row_key: Callable[[Any], Optional[Hashable]],
+    is_deleted: Callable[[Any], Any],
+    merge_row: Callable[[Any, Any], Any],
+    changes: Any = None,
+) -> list[Any]:
+    """Rows with delta rows upserted and deleted by key, shared by models and decoded JSON.
+
+    Rows are copied once per delta, then each delta row is upserted in constant time,
+    positions by key are carried over to the following deltas.
+    Delta rows without key are appended, as they can't be matched with any row.
+
+    Args:
+        row_key: Key of row, or None if row has no key.
+        is_deleted: Whether delta row deletes the row of its key.
+        merge_row: Row with delta row of the same key merged.
+        changes: Receives keys of rows by `row_inserted`, `row_updated` and `row_deleted`,
+            e.g. saxobank.subscription.ChangeSet.
+
+    Returns:
+        New read-only list, rows is never modified.
+    """
+    if not delta_rows:
+        return rows
+
+    merged = _KeyedRows(rows)
+    if isinstance(rows, _KeyedRows):
+        merged.positions = rows.positions.copy()
+    else:
+        merged.positions = _positions(merged, row_key)
+
+    has_deleted = False
+    for row in delta_rows:
+        key = row_key(row)
+        position = merged.positions.get(key) if key is not None else None
+        if is_deleted(row):
+            if position is not None:
+                list.__setitem__(merged, position, None)
+                del merged.positions[key]
+                has_deleted = True
+                if changes is not None:
+                    changes.row_deleted(key)
+        elif position is None:
+            if key is not None:
+                merged.positions[key] = len(merged)
+                if changes is not None:
+                    changes.row_inserted(key)
+            list.append(merged, row)
+        else:
+            list.__setitem__(merged, position, merge_row(merged[position], row))
+            if changes is not None:
+                changes.row_updated(key)
+
+    if has_deleted:
+        list.__setitem__(merged, slice(None), [r for r in merged if r is not None])
+        merged.positions = _positions(merged, row_key)
+    return merged
+
+
+def _positions(rows: list[Any], row_key: Callable[[Any], Optional[Hashable]]) -> dict[Any, int]:
+    positions = {}
+    for i, row in enumerate(rows):
+        key = row_key(row)
+        if key is not None:
+            positions[key] = i
+    return positions
+
+
+def merge_rows(rows: list[Any], delta_rows: list[Any], changes: Any = None) -> list[Any]:
+    """Rows with delta rows of models upserted and deleted by list key of row model.
+
+    See `merge_keyed_rows`, rows are keyed by `_list_key` and deleted by `meta_deleted`.
+    Row models without `_list_key` are not keyed, delta rows are added to them unless already contained.
+
+    Returns:
+        New read-only list, rows is never modified.
+    """
+    if not delta_rows:
+        return rows
+
+    key = getattr(type(delta_rows[0]), "_list_key", None)
+    if key is None:
+        return ReadOnlyList(rows + [r for r in delta_rows if r not in rows])
+
+    return merge_keyed_rows(
+        rows,
+        delta_rows,
+        lambda row: getattr(row, key, None),
+        lambda row: getattr(row, "meta_deleted", None),
+        lambda row, delta_row: row.merge(delta_row),
+        changes,
+    )
 
     # def update(self, value: Any, key: Optional[str] = None) -> None:
     #     if isinstance(value, SaxobankModel):
@@ -255,9 +657,7 @@ class _Snapshot(SaxobankModel):
     Snapshot: SaxobankModel
 
     def apply_delta(self, delta: SaxobankModel) -> SaxobankModel:
-        d = self.dict()
-        d.update(delta.dict(exclude_unset=True))
-        return self.__class__(**d)
+        return self.model_copy(update={k: getattr(delta, k) for k in delta.model_fields_set})
 
 
 class _RespCreateSubscription(SaxobankModel):
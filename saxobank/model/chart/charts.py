@@ -1,25 +1,46 @@
 from __future__ import annotations
 
 from dataclasses import KW_ONLY, dataclass, fields
-from datetime import datetime
+from datetime import datetime, timezone
 from enum import Enum
-from typing import Any, ClassVar, Dict, List, Literal, Optional, Set, Tuple, Type, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    ClassVar,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    Union,
+    overload,
+)
 
 from attrs import define
 
 from saxobank.model import common
 
 from ..base import (
+    ReadOnlyList,
     SaxobankModel,
     SaxobankModel2,
     SaxobankRootModel2,
     _ReqCreateSubscription,
     _ReqRemoveSubscription,
     _RespCreateSubscription,
-    ommit_datetime_zero,
+    parse_timestamp,
+    parse_timestamps,
 )
 from ..common import AssetType, ChartRequestMode
 
+if TYPE_CHECKING:
+    import numpy as np
+
 
 # ****************************************************************
 # SubModels
@@ -41,7 +62,7 @@ class ChartFieldGroupSpec(str, Enum):
 
 
 # class ChartInfo(SaxobankModel):
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ChartInfo(SaxobankModel2):
     """Represents ChartInfo.
     Attributes:
@@ -57,10 +78,11 @@ class ChartInfo(SaxobankModel2):
     DelayedByMinutes: Optional[int] = None
 
     def __post_init__(self) -> None:
-        super().__post_init__()
+        # Zero argument super() doesn't work in slotted dataclass.
+        SaxobankModel2.__post_init__(self)
 
         if self.FirstSampleTime and not isinstance(self.FirstSampleTime, datetime):
-            self.FirstSampleTime = ommit_datetime_zero(self.FirstSampleTime)
+            object.__setattr__(self, "FirstSampleTime", parse_timestamp(self.FirstSampleTime))
 
     # def __post_init__(self):
     #     if not isinstance(self.FirstSampleTime, datetime):
@@ -68,17 +90,20 @@ class ChartInfo(SaxobankModel2):
 
 
 # class ChartSample(SaxobankModel):
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ChartSample(SaxobankModel2):
+    # Deltas carry new samples and updates of the latest one, keyed by time.
+    _list_key: ClassVar[Optional[str]] = "Time"
+
     CloseAsk: float
     CloseBid: float
     Time: Union[datetime, str]
 
     def __post_init__(self) -> None:
-        super().__post_init__()
+        SaxobankModel2.__post_init__(self)
 
         if not isinstance(self.Time, datetime):
-            self.Time = ommit_datetime_zero(self.Time)
+            object.__setattr__(self, "Time", parse_timestamp(self.Time))
 
     # def __post_init__(self):
     #     for e in fields(self):
@@ -88,6 +113,126 @@ class ChartSample(SaxobankModel2):
     #                 setattr(self, e.name, ommit_datetime_zero(value))
 
 
+# Value fields of OHLC samples, Ask/Bid ones for Forex Instruments and the others for other instruments.
+SAMPLE_VALUE_FIELDS = (
+    "OpenAsk",
+    "OpenBid",
+    "HighAsk",
+    "HighBid",
+    "LowAsk",
+    "LowBid",
+    "CloseAsk",
+    "CloseBid",
+    "Open",
+    "High",
+    "Low",
+    "Close",
+    "Volume",
+    "Interest",
+)
+
+
+class ChartSamples(Sequence[ChartSample]):
+    """OHLC samples held column by column in contiguous NumPy arrays.
+
+    Time is a datetime64[ms] column in UTC and values are float64 ones, missing values are NaN.
+    Rows are still readable as `ChartSample` for compatibility, built when accessed.
+    That requires CloseAsk and CloseBid columns of Forex Instruments,
+    samples of the other instruments are read by `to_numpy` only.
+
+    Requires numpy, which is an optional dependency.
+    """
+
+    __slots__ = ("_columns", "_length")
+
+    def __init__(self, columns: Mapping[str, np.ndarray]) -> None:
+        lengths = {len(column) for column in columns.values()}
+        if 1 < len(lengths):
+            raise ValueError("Columns of samples must have the same length.")
+
+        self._columns = {name: _readonly_view(column) for name, column in columns.items()}
+        self._length = lengths.pop() if lengths else 0
+
+    @classmethod
+    def from_json(cls, samples: Sequence[Mapping[str, Any]]) -> ChartSamples:
+        """Build columns from decoded JSON samples, one pass per column.
+
+        Value fields present in the first sample become columns,
+        missing and null values of the other samples are NaN.
+
+        Raises:
+            ImportError: numpy is not installed.
+        """
+        import numpy as np
+
+        count = len(samples)
+        names = [name for name in SAMPLE_VALUE_FIELDS if samples and name in samples[0]]
+
+        columns = {"Time": parse_timestamps([s["Time"] for s in samples])}
+        for name in names:
+            columns[name] = np.fromiter(
+                (np.nan if s.get(name) is None else s[name] for s in samples),
+                dtype=np.float64,
+                count=count,
+            )
+        return cls(columns)
+
+    @property
+    def columns(self) -> Tuple[str, ...]:
+        return tuple(self._columns)
+
+    def to_numpy(self, column: str) -> np.ndarray:
+        """Read-only view of column, without copying."""
+        return self._columns[column]
+
+    def __len__(self) -> int:
+        return self._length
+
+    @overload
+    def __getitem__(self, index: int) -> ChartSample:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> ChartSamples:
+        ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[ChartSample, ChartSamples]:
+        if isinstance(index, slice):
+            return ChartSamples({name: column[index] for name, column in self._columns.items()})
+
+        close_ask, close_bid, time = self._row_columns()
+        return ChartSample(
+            CloseAsk=float(close_ask[index]),
+            CloseBid=float(close_bid[index]),
+            Time=time[index].item().replace(tzinfo=timezone.utc),
+        )
+
+    def __iter__(self) -> Iterator[ChartSample]:
+        close_ask, close_bid, time = self._row_columns()
+        for i in range(self._length):
+            yield ChartSample(
+                CloseAsk=float(close_ask[i]),
+                CloseBid=float(close_bid[i]),
+                Time=time[i].item().replace(tzinfo=timezone.utc),
+            )
+
+    def _row_columns(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # ChartSample holds Close values of Forex Instruments only.
+        missing = [name for name in ("CloseAsk", "CloseBid") if name not in self._columns]
+        if missing:
+            raise ValueError(
+                f"Rows of samples are ChartSample, which needs columns {missing}. "
+                f"Read columns {self.columns} by to_numpy instead."
+            )
+        return self._columns["CloseAsk"], self._columns["CloseBid"], self._columns["Time"]
+
+
+def _readonly_view(column: np.ndarray) -> np.ndarray:
+    view = column.view()
+    view.flags.writeable = False
+    return view
+
+
 # class Data(SaxobankRootModel):
 @dataclass
 class Data(SaxobankRootModel2):
@@ -96,7 +241,7 @@ class Data(SaxobankRootModel2):
         root (list[charts.ChartSample]): Array holding the individual OHLC samples. For Forex Instruments both Bid and Ask values are returned. For other instruments the values are the last traded values.
     """
 
-    _root: list[ChartSample] | list[dict[str, Any]]
+    _root: list[ChartSample] | list[dict[str, Any]] | ChartSamples
 
 
 # ****************************************************************
@@ -120,13 +265,17 @@ class ChartSubscriptionRequest(SaxobankModel2):
             self.AssetType = AssetType(self.AssetType)
 
 
-@dataclass
-class ReqSubscriptionsPost(SaxobankModel2):
-    Arguments: Union[ChartSubscriptionRequest, dict[str, Any]]
+class ReqSubscriptionsPost(_ReqCreateSubscription):
+    """Represents bellow Saxobank OpenAPI requests.
+    https://www.developer.saxo/openapi/referencedocs/chart/v1/charts/addsubscriptionasync/dbf87ad4302f2d4289be19be8cb4a3db
+    """
+
+    Arguments: ChartSubscriptionRequest
 
 
 class ReqSubscriptionDelete(_ReqRemoveSubscription):
-    pass
+    def path_items(self) -> dict[str, Any]:
+        return {"ContextId": self.ContextId, "ReferenceId": self.ReferenceId}
 
 
 # ****************************************************************
@@ -135,10 +284,12 @@ class ReqSubscriptionDelete(_ReqRemoveSubscription):
 # class GetResp(SaxobankModel):
 
 
-@dataclass
+@dataclass(frozen=True)
 class GetResp(SaxobankModel2):
     """Represents conposit model.
 
+    Snapshot of chart subscription, frozen with read-only Data so that it's shared with consumers safely.
+
     Attributes descriptions are referenced from [OpenAPI Reference]: https://www.developer.saxo/openapi/referencedocs/chart/v1/charts/getchartdataasync/387cfc61d3292d9237095b9144ac4733/.
 
     Attributes:
@@ -149,23 +300,25 @@ class GetResp(SaxobankModel2):
     """
 
     # Data: list[Union[ChartSample, dict[str, Any]]]
-    Data: Data | list[dict[str, Any]]
+    Data: list[ChartSample] | list[dict[str, Any]]
     DataVersion: int
     ChartInfo: Optional[Union[ChartInfo, Dict[str, Any]]] = None
 
-    # _partitions: Set[int] = set()
-
-    def apply_delta(self, delta: Any) -> Tuple[ChartResponse, bool]:
-        if not isinstance(delta, SaxobankModel):
-            delta = RespSubscriptionsStreaming.parse_obj(delta)
+    def __post_init__(self) -> None:
+        super().__post_init__()
 
-        if delta.PartitionNumber:
-            self._partitions.add(delta.PartitionNumber)
+        if self.ChartInfo and not isinstance(self.ChartInfo, ChartInfo):
+            object.__setattr__(self, "ChartInfo", ChartInfo(**self.ChartInfo))
+        if any(not isinstance(sample, ChartSample) for sample in self.Data):
+            samples = [s if isinstance(s, ChartSample) else ChartSample(**s) for s in self.Data]
+            object.__setattr__(self, "Data", ReadOnlyList(samples))
+        elif type(self.Data) is list:
+            object.__setattr__(self, "Data", ReadOnlyList(self.Data))
 
-        is_parted = (
-            bool(len(self._partitions) == delta.TotalPartition) if delta.TotalPartition else False
-        )
-        return self.merge(delta.Data), is_parted
+    def apply_delta(self, delta: Any, changes: Any = None) -> Tuple[GetResp, bool]:
+        # Partitioned deltas are assembled by saxobank.subscription.Subscription, delta is always a whole one.
+        # Samples of delta are upserted by time, see SaxobankModel2.merge.
+        return self.merge(delta, changes), False
 
 
 # class RespSubscriptionsStreaming(_RespPartedStreaming):
@@ -173,4 +326,4 @@ class GetResp(SaxobankModel2):
 
 
 class RespSubscriptionsPost(_RespCreateSubscription):
-    Snapshot: ChartResponse
+    Snapshot: GetResp
@@ -6,6 +6,9 @@ from enum import Enum, auto, unique
 from typing import Any, Optional
 from uuid import uuid4
 
+from pydantic import GetCoreSchemaHandler
+from pydantic_core import CoreSchema, core_schema
+
 
 # TODO: Not full covered
 class AssetType(str, Enum):
@@ -259,6 +262,13 @@ class PriceMode(str, Enum):
     RegularTradingHours = "RegularTradingHours"
 
 
+class SubscriptionFormat(str, Enum):
+    """Media type of data updates streamed for a subscription."""
+
+    Json = "application/json"
+    Protobuf = "application/x-protobuf"
+
+
 class TradeLevel(str, Enum):
     FullTradingAndChat = "FullTradingAndChat"
     OrdersOnly = "OrdersOnly"
@@ -301,6 +311,11 @@ class ContextId(str):
             cls.MIN_ID_LENGTH <= len(chars) <= cls.MAX_ID_LENGTH
         )
 
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler: GetCoreSchemaHandler) -> CoreSchema:
+        # Accept str of responses, as constructor does.
+        return core_schema.no_info_after_validator_function(cls, core_schema.str_schema())
+
 
 class ReferenceId(str):
     def __new__(cls, v: Optional[object] = None) -> ReferenceId:
@@ -315,6 +330,12 @@ class ReferenceId(str):
             print(ex)
             raise ex
 
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler: GetCoreSchemaHandler) -> CoreSchema:
+        return core_schema.with_info_after_validator_function(
+            cls.validate, core_schema.str_schema()
+        )
+
 
 @unique
 class ResponseCode(Enum):
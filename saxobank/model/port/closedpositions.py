@@ -1,7 +1,7 @@
 # from datetime import datetime
 from __future__ import annotations
 
-from typing import List
+from typing import ClassVar, List
 from typing import Optional as N
 
 from pydantic import Field
@@ -9,6 +9,7 @@ from pydantic import Field
 from ..base import (
     ODataRequest,
     ODataResponse,
+    SaxobankListItemModel,
     SaxobankModel,
     _ReqCreateSubscription,
     _RespCreateSubscription,
@@ -42,7 +43,9 @@ class PostSubscriptionReq(_ReqCreateSubscription):
 
 
 # Not fully covered
-class ClosedPositionResponse(SaxobankModel):
+class ClosedPositionResponse(SaxobankListItemModel):
+    _list_key: ClassVar[str] = "ClosedPositionUniqueId"
+
     ClosedPositionUniqueId: str
     NetPositionId: N[str]
     ClosedPosition: N[ClosedPosition]
@@ -5,9 +5,10 @@ from __future__ import annotations
 from decimal import Decimal
 
 # from typing import List
+from typing import ClassVar
 from typing import Optional as N
 
-from ..base import ODataRequest, ODataResponse, SaxobankModel
+from ..base import ODataRequest, ODataResponse, SaxobankListItemModel, SaxobankModel
 from ..common import (
     AccountKey,
     AssetType,
@@ -91,7 +92,9 @@ class MeReq(SaxobankModel, ODataRequest):
 # ****************************************************************
 # Response Main Models
 # ****************************************************************
-class PositionsRes(SaxobankModel):
+class PositionsRes(SaxobankListItemModel):
+    _list_key: ClassVar[str] = "PositionId"
+
     NetPositionId: N[str]
     PositionId: N[str]
     PositionBase: N[PositionStatic]
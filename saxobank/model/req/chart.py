@@ -9,7 +9,7 @@ from typing import ClassVar
 
 from ... import model
 from .. import chart, common
-from ..base import SaxobankModel2, ommit_datetime_zero
+from ..base import SaxobankModel2, parse_timestamp
 
 
 @dataclass
@@ -46,5 +46,4 @@ class GetChartCharts(SaxobankModel2):
         if self.Mode and not isinstance(self.Mode, common.ChartRequestMode):
             self.Mode = common.ChartRequestMode(self.Mode)
         if self.Time and not isinstance(self.Time, datetime):
-            self.Time = ommit_datetime_zero(self.Time)
-
+            self.Time = parse_timestamp(self.Time)
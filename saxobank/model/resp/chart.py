@@ -24,7 +24,11 @@ class GetChartChartsResp(SaxobankModel2):
     """
 
     ChartInfo: model.chart.charts.ChartInfo | dict[str, Any]
-    Data: list[model.chart.charts.ChartSample] | list[dict[str, Any]]
+    Data: (
+        list[model.chart.charts.ChartSample]
+        | list[dict[str, Any]]
+        | model.chart.charts.ChartSamples
+    )
     DataVersion: int
     # DisplayAndFormat: model.common.Dis | str | None = None
 
@@ -33,10 +37,24 @@ class GetChartChartsResp(SaxobankModel2):
 
         if self.ChartInfo and not isinstance(self.ChartInfo, model.chart.charts.ChartInfo):
             self.ChartInfo = model.chart.charts.ChartInfo(**self.ChartInfo)
-        if self.Data and any(
-            (not isinstance(member, model.chart.charts.ChartSample) for member in self.Data)
+        if (
+            self.Data
+            and not isinstance(self.Data, model.chart.charts.ChartSamples)
+            and any(
+                (not isinstance(member, model.chart.charts.ChartSample) for member in self.Data)
+            )
         ):
             self.Data = [
                 model.chart.charts.ChartSample(**member)
                 for member in cast(list[dict[str, Any]], self.Data)
             ]
+
+    @classmethod
+    def from_json_columnar(cls, json: dict[str, Any]) -> "GetChartChartsResp":
+        """Build response holding samples in columns, see `saxobank.model.chart.charts.ChartSamples`.
+
+        Raises:
+            ImportError: numpy is not installed.
+        """
+        samples = model.chart.charts.ChartSamples.from_json(json.get("Data", []))
+        return cls(**{**json, "Data": samples})
@@ -10,7 +10,7 @@ from ... import model
 from ..base import SaxobankModel2
 
 
-@dataclass
+@dataclass(slots=True)
 class PostPortOrdersSubscriptionsStreamingResp(SaxobankModel2):
     """Streaming response model for [`saxobank.application.Client.post_port_orders_subscriptions`][]
 
@@ -27,7 +27,8 @@ class PostPortOrdersSubscriptionsStreamingResp(SaxobankModel2):
     Uic: int
 
     def __post_init__(self) -> None:
-        super().__post_init__()
+        # Zero argument super() doesn't work in slotted dataclass.
+        SaxobankModel2.__post_init__(self)
 
         if self.AccountKey and not isinstance(self.AccountKey, model.common.AccountKey):
             self.AccountKey = model.common.AccountKey(self.AccountKey)
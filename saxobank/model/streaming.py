@@ -8,7 +8,7 @@ from typing import List, Literal, Optional, Sequence, Set, TypeVar, Union, cast
 # from dataclasses import dataclass
 from attrs import define, field, validators
 
-from .base import SaxobankModel, SaxobankRootModel
+from .base import SaxobankModel
 from .common import ContextId, HeartbeatReason, ReferenceId
 
 # @dataclass
@@ -32,11 +32,17 @@ def str2enum(cls, x: Union[str, _T1]) -> _T1:
 str2heartbeat_reason = partial(str2enum, HeartbeatReason)
 
 
-@dataclass
+@dataclass(slots=True)
 class Heartbeats:
     OriginatingReferenceId: ReferenceId
     Reason: HeartbeatReason
 
+    def __post_init__(self) -> None:
+        if not isinstance(self.OriginatingReferenceId, ReferenceId):
+            self.OriginatingReferenceId = ReferenceId(self.OriginatingReferenceId)
+        if not isinstance(self.Reason, HeartbeatReason):
+            self.Reason = HeartbeatReason(self.Reason)
+
     # OriginatingReferenceId: ReferenceId = field(
     #     init=True,
     #     converter=str2reference_id,
@@ -64,10 +70,13 @@ class ResHeartbeat:
     ReferenceId: Literal["_heartbeat"]
     Heartbeats: List[Heartbeats]
 
-    # def filter_reasons(self, reasons: Container[HeartbeatReason]) -> Set[Heartbeats]:
-    #     return {
-    #         h.OriginatingReferenceId for h in self.Heartbeats if h.Reason in reasons
-    #     }
+    def __post_init__(self) -> None:
+        self.Heartbeats = [
+            h if isinstance(h, Heartbeats) else Heartbeats(**h) for h in self.Heartbeats
+        ]
+
+    def filter_reasons(self, reasons: Container[HeartbeatReason]) -> Set[ReferenceId]:
+        return {h.OriginatingReferenceId for h in self.Heartbeats if h.Reason in reasons}
 
 
 class ResResetSubscriptions(SaxobankModel):
@@ -1,151 +1,321 @@
-import json
+import asyncio
+import itertools
+import struct
+from collections import Counter, deque
 
 # from contextlib import asynccontextmanager
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass, is_dataclass
 from datetime import datetime, timezone
-from functools import lru_cache, partialmethod
+from enum import Enum, IntEnum
+from functools import partial, partialmethod
 from types import TracebackType
-from typing import Any, Coroutine, Literal, Optional, Type, Union
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Coroutine,
+    Deque,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Type,
+    Union,
+    cast,
+    get_args,
+)
 from urllib.parse import urljoin
 
 import aiohttp
 
 # from api_call import Dispatcher
 from . import endpoint, exception
+from .codec import STDLIB_CODEC, JsonCodec, protobuf_decoder
 from .common import auth_header
 from .environment import WsBaseUrl
 from .model import streaming as model_streaming
 from .model.base import SaxobankModel
-from .model.common import ContextId, HeartbeatReason, ReferenceId, ResponseCode
-from .subscription import Subscription, Subscriptions
+from .model.chart.charts import ChartSubscriptionRequest
+from .model.common import (
+    ContextId,
+    HeartbeatReason,
+    ReferenceId,
+    ResponseCode,
+    SubscriptionFormat,
+)
+from .subscription import (
+    ChangeSet,
+    LazySnapshot,
+    PayloadDecoder,
+    Subscription,
+    Subscriptions,
+)
 
 # from .subscription import PortClosedPositions
 from .user_session import UserSession
+from .validation import STRICT_VALIDATION, ValidationPolicy, use_validation_policy
 
 # from subscription import BaseSubscription
 
 
-@dataclass(frozen=True)
-class _DataMessageLayout:
-    INDEX: int
-    SIZE: int
+class PayloadFormat(IntEnum):
+    """Payload format byte of data message."""
+
+    Json = 0
+    Protobuf = 1
 
 
 class DataMessage:
-    __LAYOUT_MESSAGE_ID = _DataMessageLayout(0, 8)
-    __LAYOUT_REF_ID_SIZE = _DataMessageLayout(10, 1)
-    __LAYOUT_REF_ID = _DataMessageLayout(11, 0)
-    __LAYOUT_PAYLOAD_FORMAT = _DataMessageLayout(11, 1)
-    __LAYOUT_PAYLOAD_SIZE = _DataMessageLayout(12, 4)
-    __LAYOUT_PAYLOAD = _DataMessageLayout(16, 0)
-
-    __BYTEORDER: Literal["little", "big"] = "little"
+    """Data message received from streaming connection.
+
+    Header fields are decoded once on construction with the frame kept as it is,
+    and payload is exposed as a view of the frame, so that no bytes are copied until decoding.
+    A frame may pack several messages back to back, use `DataMessage.split` to get all of them.
+    """
+
+    __slots__ = (
+        "message",
+        "message_id",
+        "reference_id",
+        "_payload_fmt",
+        "_payload_size",
+        "_payload_view",
+        "_end",
+        "_codec",
+    )
+
+    # Message ID(8 bytes), reserved(2 bytes) and size of Reference ID(1 byte).
+    __HEADER = struct.Struct("<Q2xB")
+    # Payload format(1 byte) and size of payload(4 bytes), follows Reference ID.
+    __PAYLOAD_HEADER = struct.Struct("<BI")
+
     __DECODE_ERROR = "strict"
     __ENCODING_ASCII = "ascii"
-    __ENCODING_UTF8 = "utf-8"
 
-    __PAYLOAD_FORMAT_JSON = 0
+    def __init__(self, message: bytes, offset: int = 0, codec: JsonCodec = STDLIB_CODEC) -> None:
+        """Decode header of the data message starting at offset of message.
 
-    def __init__(self, message: bytes) -> None:
+        Raises:
+            TruncatedDataMessageError: Header or payload runs past the end of message.
+        """
         self.message = message
+        self._codec = codec
+        view = memoryview(message)
+
+        try:
+            self.message_id, ref_id_size = self.__HEADER.unpack_from(view, offset)
+            ref_id_index = offset + self.__HEADER.size
+            self.reference_id = str(
+                view[ref_id_index : ref_id_index + ref_id_size],
+                self.__ENCODING_ASCII,
+                self.__DECODE_ERROR,
+            )
 
-    @classmethod
-    @lru_cache()
-    def __parse_int(cls, b: bytes) -> int:
-        return int.from_bytes(b, cls.__BYTEORDER)
+            payload_header_index = ref_id_index + ref_id_size
+            self._payload_fmt, self._payload_size = self.__PAYLOAD_HEADER.unpack_from(
+                view, payload_header_index
+            )
+        except struct.error:
+            raise exception.TruncatedDataMessageError(offset, len(view)) from None
 
-    @classmethod
-    def __parse_json(cls, b: bytes) -> Any:
-        return json.loads(b.decode(cls.__ENCODING_UTF8, cls.__DECODE_ERROR))
+        payload_index = payload_header_index + self.__PAYLOAD_HEADER.size
+        self._end = payload_index + self._payload_size
+        if len(view) < self._end:
+            raise exception.TruncatedDataMessageError(offset, len(view))
+        self._payload_view = view[payload_index : self._end]
 
     @classmethod
-    @lru_cache()
-    def __parse_str(cls, b: bytes) -> str:
-        return b.decode(cls.__ENCODING_ASCII, cls.__DECODE_ERROR)
+    def split(cls, frame: bytes, codec: JsonCodec = STDLIB_CODEC) -> Iterator["DataMessage"]:
+        """Yield every data message packed in a frame, in order of arrival.
 
-    @classmethod
-    def __cut(cls, bytes: bytes, index: int, size: int) -> bytes:
-        return bytes[index : index + size]
+        Args:
+            frame: Binary frame received from streaming connection.
+            codec: Codec to decode JSON payloads.
 
-    @property
-    def _payload_size(self) -> int:
-        return self.__parse_int(
-            self.__cut(
-                self.message,
-                self.__LAYOUT_PAYLOAD_SIZE.INDEX + self.__reference_id_size,
-                self.__LAYOUT_PAYLOAD_SIZE.SIZE,
-            )
-        )
+        Yields:
+            Data messages sharing the frame without copying it.
 
-    @property
-    def __reference_id_size(self) -> int:
-        return self.__parse_int(
-            self.__cut(
-                self.message,
-                self.__LAYOUT_REF_ID_SIZE.INDEX,
-                self.__LAYOUT_REF_ID_SIZE.SIZE,
-            )
-        )
+        Raises:
+            TruncatedDataMessageError: The last message is cut off, the ones before are yielded.
+        """
+        offset = 0
+        while offset < len(frame):
+            message = cls(frame, offset, codec)
+            offset = message._end
+            yield message
 
     @property
-    def message_id(self) -> int:
-        return self.__parse_int(
-            self.__cut(
-                self.message,
-                self.__LAYOUT_MESSAGE_ID.INDEX,
-                self.__LAYOUT_MESSAGE_ID.SIZE,
-            )
-        )
+    def raw_payload(self) -> memoryview:
+        """View of payload bytes on the received frame."""
+        return self._payload_view
 
     @property
     def payload(self) -> Any:
+        """Payload decoded as JSON, None if it is in other format."""
         return (
-            self.__parse_json(
-                self.__cut(
-                    self.message,
-                    self.__LAYOUT_PAYLOAD.INDEX + self.__reference_id_size,
-                    self._payload_size,
-                )
-            )
-            if self._payload_fmt == self.__PAYLOAD_FORMAT_JSON
-            else None  # ProtoBuf(Not supported because un-documented at Saxobank.)
+            self._codec.loads(self._payload_view)
+            if self._payload_fmt == PayloadFormat.Json
+            else None
         )
 
-    @property
-    def _payload_fmt(self) -> int:
-        return self.__parse_int(
-            self.__cut(
-                self.message,
-                self.__LAYOUT_PAYLOAD_FORMAT.INDEX + self.__reference_id_size,
-                self.__LAYOUT_PAYLOAD_FORMAT.SIZE,
-            )
-        )
 
-    @property
-    def reference_id(self) -> str:
-        return self.__parse_str(
-            self.__cut(
-                self.message,
-                self.__LAYOUT_REF_ID.INDEX,
-                self.__LAYOUT_REF_ID.SIZE + self.__reference_id_size,
-            )
-        )
+class FrameBuffer:
+    """Raw frames read from websocket, waiting to be decoded by consumer.
+
+    Reader waits only when the size limit is reached, a frame larger than the limit is still accepted
+    by empty buffer.
+
+    Attributes:
+        max_bytes: Size limit of buffered frames.
+        buffered_bytes: Size of buffered frames.
+        high_water_mark: The largest size of buffered frames so far.
+        stalls: Number of times reader waited for consumer because buffer was full.
+        closed: No more frames will be put.
+    """
+
+    DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.buffered_bytes = 0
+        self.high_water_mark = 0
+        self.stalls = 0
+        self.closed = False
+        self._frames: Deque[bytes] = deque()
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._writable.set()
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    async def put(self, frame: bytes) -> None:
+        while self._frames and self.max_bytes < self.buffered_bytes + len(frame):
+            self.stalls += 1
+            self._writable.clear()
+            await self._writable.wait()
+
+        self._frames.append(frame)
+        self.buffered_bytes += len(frame)
+        self.high_water_mark = max(self.high_water_mark, self.buffered_bytes)
+        self._readable.set()
+
+    def get_nowait(self) -> Optional[bytes]:
+        """Oldest frame, None if buffer is empty."""
+        if not self._frames:
+            return None
+
+        frame = self._frames.popleft()
+        self.buffered_bytes -= len(frame)
+        self._writable.set()
+        return frame
+
+    async def wait_readable(self, timeout: Optional[float] = None) -> bool:
+        """Wait until a frame is buffered or buffer is closed.
+
+        Returns:
+            False if timed out.
+        """
+        if self._frames or self.closed:
+            return True
+
+        self._readable.clear()
+        try:
+            await asyncio.wait_for(self._readable.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def get(self) -> Optional[bytes]:
+        """Wait and return the oldest frame, None if buffer is empty and closed."""
+        while not self._frames:
+            if self.closed:
+                return None
+            self._readable.clear()
+            await self._readable.wait()
+        return self.get_nowait()
+
+    def close(self) -> None:
+        self.closed = True
+        self._readable.set()
+
+
+@dataclass(frozen=True)
+class SnapshotUpdate:
+    """Snapshot emitted by streaming.
+
+    Attributes:
+        reference_id: Reference ID of subscription.
+        tag: Tag of subscription.
+        snapshot: Latest snapshot of subscription, `LazySnapshot` if subscription is in raw mode.
+        coalesced: Number of updates merged into the snapshot without being emitted, by conflation.
+        changes: Fields and rows changed since the previous update of subscription, coalesced ones included.
+            None unless the subscription tracks changes.
+    """
+
+    reference_id: ReferenceId
+    tag: Optional[str]
+    snapshot: Union[SaxobankModel, LazySnapshot]
+    coalesced: int = 0
+    changes: Optional[ChangeSet] = None
 
 
 class Streaming:
     _REF_ID_HEARTBEAT = "_heartbeat"
     _REF_ID_RESETSUBSCRIPTIONS = "_resetsubscriptions"
     _REF_ID_DISCONNECT = "_disconnect"
+    _WS_CLOSED_TYPES = (
+        aiohttp.WSMsgType.CLOSE,
+        aiohttp.WSMsgType.CLOSING,
+        aiohttp.WSMsgType.CLOSED,
+        aiohttp.WSMsgType.ERROR,
+    )
 
     def __init__(
         self,
         ws_resp: aiohttp.ClientWebSocketResponse,
         subscriptions: Subscriptions,
         raise_if_stream_error: bool = False,
+        codec: JsonCodec = STDLIB_CODEC,
+        max_buffer_bytes: int = FrameBuffer.DEFAULT_MAX_BYTES,
+        validation_policy: ValidationPolicy = STRICT_VALIDATION,
     ):
         self._ws_resp = ws_resp
+        self._codec = codec
+        self._validation_policy = validation_policy
         self._subscriptions = subscriptions
         self._raise_error = raise_if_stream_error
+        # Socket is drained by reader task regardless of consumers, decoding is left to them.
+        self.buffer = FrameBuffer(max_buffer_bytes)
+        self._reader_task: Optional[asyncio.Task] = None
+        self._pending: Deque[DataMessage] = deque()
+        # Number of pending messages per Reference ID, to know if newer update is already received.
+        self._pending_refs: Counter[str] = Counter()
+        # Message ID of the last consumed message, to resume from it on reconnection.
+        self.last_message_id: Optional[int] = None
+        self.untracked_messages = 0
+        self._payload_decoders: Dict[int, PayloadDecoder] = {PayloadFormat.Json: codec.loads}
+
+    def register_payload_decoder(self, payload_format: int, decoder: PayloadDecoder) -> None:
+        """Register decoder used for payload format of all subscriptions.
+
+        Decoders registered to subscription take precedence.
+        """
+        self._payload_decoders[payload_format] = decoder
+
+    def _decode(self, message: DataMessage, subscription: Subscription) -> Any:
+        payload_format = message._payload_fmt
+        decoder = subscription.payload_decoders.get(payload_format) or self._payload_decoders.get(
+            payload_format
+        )
+        if not decoder:
+            raise exception.UnsupportedPayloadFormatError(subscription.reference_id, payload_format)
+        return decoder(message.raw_payload)
 
     def __aiter__(self) -> "Streaming":
         return self
@@ -157,19 +327,30 @@ class Streaming:
 
     @property
     def _empty(self) -> bool:
-        return len(self._ws_resp._reader) == 0
+        return not self._pending and not self.buffer
+
+    def _start_reader(self) -> None:
+        if self._reader_task is None:
+            self._reader_task = asyncio.ensure_future(self._read())
+
+    async def _read(self) -> None:
+        try:
+            while True:
+                ws_message = await self._ws_resp.receive()
+                if ws_message.type in self._WS_CLOSED_TYPES:
+                    return
+                if ws_message.type == aiohttp.WSMsgType.BINARY:
+                    await self.buffer.put(ws_message.data)
+        finally:
+            self.buffer.close()
 
     def _handle_reset_subscriptions(self, payload: Any) -> Exception:
         reset_subscriptions = model_streaming.ResResetSubscriptions.parse_obj(payload)
 
         if reset_subscriptions.TargetReferenceIds:
-            self._subscriptions.remove_items(
-                reference_ids=reset_subscriptions.TargetReferenceIds
-            )
+            self._subscriptions.remove_items(reference_ids=reset_subscriptions.TargetReferenceIds)
             return self._return_or_raise(
-                exception.ResetSubscriptionsError(
-                    reset_subscriptions.TargetReferenceIds
-                )
+                exception.ResetSubscriptionsError(reset_subscriptions.TargetReferenceIds)
             )
 
         # All reference ids are required to reset if no TargetReferenceIds set.
@@ -177,26 +358,123 @@ class Streaming:
         self._subscriptions.clear()
         return self._return_or_raise(exception.ResetSubscriptionsError(need_resets))
 
+    @property
+    def closed(self) -> bool:
+        """Connection was closed and all received messages were consumed."""
+        return (self._ws_resp.closed or self.buffer.closed) and self._empty
+
     async def receive(self) -> Union[SaxobankModel, Exception]:
+        update = await self.receive_update()
+        return update if isinstance(update, Exception) else update.snapshot
+
+    async def receive_update(self) -> Union[SnapshotUpdate, Exception]:
+        """Receive next snapshot along with its subscription info."""
+        return cast(Union[SnapshotUpdate, Exception], await self._receive())
+
+    async def receive_many(
+        self, max_items: int = 1000, max_wait: Optional[float] = None
+    ) -> List[Union[SnapshotUpdate, Exception]]:
+        """Receive all snapshot updates already received, at once.
+
+        Waits for the first update only, then decodes whatever is buffered without waiting.
+        A stream error ends the batch, so that it's placed in order.
+
+        Args:
+            max_items: Max number of updates to return.
+            max_wait: Seconds to wait for the first update, waits endlessly if None.
+
+        Returns:
+            Updates and stream errors in order of arrival, empty if nothing arrived within max_wait.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_wait if max_wait is not None else None
+        updates: List[Union[SnapshotUpdate, Exception]] = []
+
+        while len(updates) < max_items:
+            update = await self._receive(block=False)
+            if update is None:
+                if updates:
+                    break
+                remaining = deadline - loop.time() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    break
+                if not await self.buffer.wait_readable(remaining):
+                    break
+                continue
+
+            updates.append(update)
+            if isinstance(update, Exception):
+                break
+
+        return updates
+
+    async def batches(
+        self, max_items: int = 1000, max_wait: Optional[float] = None
+    ) -> AsyncIterator[List[Union[SnapshotUpdate, Exception]]]:
+        """Iterate over batches of `receive_many` until streaming is closed."""
+        while not self.closed:
+            batch = await self.receive_many(max_items, max_wait)
+            if batch:
+                yield batch
+
+    def _extend_pending(self, frame: bytes) -> None:
+        for message in DataMessage.split(frame, self._codec):
+            self._pending.append(message)
+            self._pending_refs[message.reference_id] += 1
+
+    def _pop_pending(self) -> DataMessage:
+        message = self._pending.popleft()
+        self._pending_refs[message.reference_id] -= 1
+        self.last_message_id = message.message_id
+        return message
+
+    async def _receive(self, block: bool = True) -> Union[SnapshotUpdate, Exception, None]:
+        """Process messages until a snapshot or an error comes out.
+
+        Models are built under the validation policy of streaming, heartbeats and merged snapshots alike.
+
+        Args:
+            block: Wait for incoming frames, otherwise return None when nothing is buffered.
+        """
+        with use_validation_policy(self._validation_policy):
+            return await self._process_messages(block)
+
+    async def _process_messages(self, block: bool) -> Union[SnapshotUpdate, Exception, None]:
         while True:
             timestamp_of_empty = datetime.now(tz=timezone.utc)
 
             # Without any incoming data, subscriptions that passed inactivity timeout should be considred as invalid.
             if self._empty:
+                # Partial sets of partitions which will never complete are dropped as well.
+                self._subscriptions.expire_partitions(timestamp_of_empty)
                 timeouts = self._subscriptions.remove_timeouts(timestamp_of_empty)
                 if timeouts:
-                    return self._return_or_raise(
-                        exception.SubscriptionTimeoutError(timeouts)
-                    )
-
-            message = DataMessage(await self._ws_resp.receive_bytes())
+                    return self._return_or_raise(exception.SubscriptionTimeoutError(timeouts))
+
+            # Drain all messages of the last frame before reading the socket again.
+            if not self._pending:
+                self._start_reader()
+                frame = await self.buffer.get() if block else self.buffer.get_nowait()
+                if frame is None:
+                    if not block and not self.buffer.closed:
+                        return None
+                    return self._return_or_raise(exception.StreamingConnectionLostError())
+
+                # Take all frames already buffered, so that conflation sees every update received.
+                while frame is not None:
+                    try:
+                        self._extend_pending(frame)
+                    except exception.TruncatedDataMessageError as ex:
+                        # Messages before the truncated one are still processed.
+                        return self._return_or_raise(ex)
+                    frame = self.buffer.get_nowait()
+
+            message = self._pop_pending()
             ref_id = message.reference_id
-            payload = message.payload
 
             if ref_id == self._REF_ID_HEARTBEAT:
                 # heartbeat = model_streaming.ResHeartbeat.parse_obj(payload)
-                heartbeat = model_streaming.ResHeartbeat.parse_obj(payload[0])
-                print(f"heartbeat {heartbeat}")
+                heartbeat = model_streaming.ResHeartbeat(**message.payload[0])
                 self._subscriptions.extend_timeout(
                     [h.OriginatingReferenceId for h in heartbeat.Heartbeats]
                 )
@@ -207,34 +485,59 @@ class Streaming:
                 if permanently_disables:
                     self._subscriptions.remove_items(reference_ids=permanently_disables)
                     return self._return_or_raise(
-                        exception.SubscriptionPermanentlyDisabledError(
-                            permanently_disables
-                        )
+                        exception.SubscriptionPermanentlyDisabledError(permanently_disables)
                     )
+                continue
 
             elif ref_id == self._REF_ID_RESETSUBSCRIPTIONS:
-                return self._handle_reset_subscriptions(payload)
+                return self._handle_reset_subscriptions(message.payload)
 
             elif ref_id == self._REF_ID_DISCONNECT:
                 return self._return_or_raise(exception.StreamingDisconnectError())
 
+            # Look up Reference ID before decoding, payload of untracked one is never used.
             try:
                 subscription = self._subscriptions.get(ref_id)
             except KeyError:
                 # trash data message of Reference ID that's not under observation
+                self.untracked_messages += 1
                 continue
 
-            await subscription.wait_preparation()
-            snapshot = subscription.apply_delta(payload)
+            try:
+                delta = self._decode(message, subscription)
+            except exception.UnsupportedPayloadFormatError as ex:
+                return self._return_or_raise(ex)
+
+            try:
+                # Snapshot is not set up yet, keep delta to replay on it without blocking the others.
+                if not subscription.is_prepared:
+                    subscription.defer_delta(delta)
+                    continue
+
+                snapshot = subscription.apply_delta(delta)
+            except exception.InvalidPartitionError as ex:
+                return self._return_or_raise(ex)
             subscription.extend_timeout()
 
             if not snapshot:
                 continue
 
-            return snapshot
+            # Conflating subscription emits only the latest of updates already received.
+            if subscription.conflate and self._pending_refs[ref_id]:
+                subscription._coalesced += 1
+                continue
+
+            coalesced, subscription._coalesced = subscription._coalesced, 0
+            return SnapshotUpdate(
+                subscription.reference_id,
+                subscription.tag,
+                snapshot,
+                coalesced,
+                subscription.pop_changes(),
+            )
 
     async def __anext__(self) -> Union[SaxobankModel, Exception]:
-        if self._ws_resp.closed:
+        if self.closed:
             raise StopAsyncIteration
         return await self.receive()
 
@@ -242,6 +545,8 @@ class Streaming:
         return self
 
     async def disconnect(self) -> bool:
+        if self._reader_task:
+            self._reader_task.cancel()
         return await self._ws_resp.close()
 
     async def __aexit__(
@@ -253,17 +558,189 @@ class Streaming:
         return await self.disconnect()
 
 
-# class Distributor:
-#     def __init__(self, streaming: Streaming, max_message_size=None):
-#         self._streaming = streaming
+class OverflowPolicy(str, Enum):
+    """Behavior of a full distribution queue when next item arrives.
 
-#     def stream(self, reference_id: ReferenceId):
-#         pass
+    Attributes:
+        Block: Wait for the consumer, which also holds back every other queue of the distributor.
+        DropOldest: Discard the oldest queued item.
+        Conflate: Replace queued snapshot of the same Reference ID with the latest one,
+            or discard the oldest item if there is none.
+    """
 
-#     async def distribute(self, on_error=None, on_disconnect=None):
-#         while True:
-#             async for message in self.streaming:
-#                 pass
+    Block = "Block"
+    DropOldest = "DropOldest"
+    Conflate = "Conflate"
+
+
+class DistributionQueue:
+    """Bounded queue of snapshot updates and stream errors routed by `Distributor`.
+
+    Attributes:
+        maxsize: Max number of queued items.
+        overflow: Policy applied when queue is full.
+        dropped: Number of items discarded or replaced by overflow policy.
+    """
+
+    def __init__(self, maxsize: int = 64, overflow: OverflowPolicy = OverflowPolicy.Block) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize must be positive.")
+
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.dropped = 0
+        # Ordered by arrival, keyed by Reference ID of snapshot to conflate it.
+        self._items: Dict[Hashable, Union[SnapshotUpdate, Exception]] = {}
+        self._sequence = itertools.count()
+        self._changed = asyncio.Condition()
+        self._closed = False
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __aiter__(self) -> "DistributionQueue":
+        return self
+
+    async def __anext__(self) -> Union[SnapshotUpdate, Exception]:
+        return await self.get()
+
+    async def put(
+        self, item: Union[SnapshotUpdate, Exception], reference_id: Optional[ReferenceId] = None
+    ) -> None:
+        async with self._changed:
+            key: Hashable = next(self._sequence)
+            if self.overflow == OverflowPolicy.Conflate and reference_id is not None:
+                key = reference_id
+                if key in self._items:
+                    self._items[key] = item
+                    self.dropped += 1
+                    return
+
+            while len(self._items) >= self.maxsize:
+                if self.overflow == OverflowPolicy.Block:
+                    await self._changed.wait()
+                else:
+                    del self._items[next(iter(self._items))]
+                    self.dropped += 1
+
+            self._items[key] = item
+            self._changed.notify_all()
+
+    async def get(self) -> Union[SnapshotUpdate, Exception]:
+        """Wait and return the oldest item.
+
+        Raises:
+            StopAsyncIteration: Queue was closed and all items were consumed.
+        """
+        async with self._changed:
+            while not self._items:
+                if self._closed:
+                    raise StopAsyncIteration
+                await self._changed.wait()
+
+            item = self._items.pop(next(iter(self._items)))
+            self._changed.notify_all()
+            return item
+
+    async def close(self) -> None:
+        async with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+
+
+class Distributor:
+    """Read streaming once and fan snapshots out to per Reference ID or per tag queues.
+
+    Each consumer reads its own queue at its own pace.
+    Stream errors are delivered to every queue.
+    """
+
+    def __init__(self, streaming: Streaming) -> None:
+        self._streaming = streaming
+        self._by_reference_id: Dict[ReferenceId, List[DistributionQueue]] = {}
+        self._by_tag: Dict[str, List[DistributionQueue]] = {}
+        # Queues shared by every caller of stream, keyed by route and Reference ID or tag.
+        self._shared: Dict[Hashable, DistributionQueue] = {}
+
+    def stream(
+        self,
+        reference_id: Optional[ReferenceId] = None,
+        tag: Optional[str] = None,
+        maxsize: int = 64,
+        overflow: OverflowPolicy = OverflowPolicy.Block,
+        shared: bool = True,
+    ) -> DistributionQueue:
+        """Queue receiving snapshots of a Reference ID or of all subscriptions having a tag.
+
+        Args:
+            reference_id: Reference ID of subscription.
+            tag: Tag of subscriptions, used if reference_id is not given.
+            maxsize: Max number of queued items.
+            overflow: Policy applied when queue is full.
+            shared: Return the same queue for the same Reference ID or tag,
+                otherwise a new queue receiving every snapshot by itself. Stop it by `detach`.
+
+        Returns:
+            Queue routed from the Reference ID or the tag.
+        """
+        routes: Dict[Any, List[DistributionQueue]]
+        if reference_id is not None:
+            routes, key = self._by_reference_id, reference_id
+        elif tag is not None:
+            routes, key = self._by_tag, tag
+        else:
+            raise ValueError("Either reference_id or tag is required.")
+
+        shared_key = (reference_id is not None, key)
+        if shared and shared_key in self._shared:
+            return self._shared[shared_key]
+
+        queue = DistributionQueue(maxsize, overflow)
+        routes.setdefault(key, []).append(queue)
+        if shared:
+            self._shared[shared_key] = queue
+        return queue
+
+    async def detach(self, queue: DistributionQueue) -> None:
+        """Stop routing snapshots to queue, then close it."""
+        for routes in (self._by_reference_id, self._by_tag):
+            for key, queues in list(routes.items()):
+                if queue in queues:
+                    queues.remove(queue)
+                    if not queues:
+                        del routes[key]
+        for key, shared in list(self._shared.items()):
+            if shared is queue:
+                del self._shared[key]
+        await queue.close()
+
+    def _queues(self) -> Set[DistributionQueue]:
+        return {
+            q
+            for routes in (self._by_reference_id, self._by_tag)
+            for qs in routes.values()
+            for q in qs
+        }
+
+    async def distribute(self) -> None:
+        """Route received snapshots until streaming is closed, then close all queues."""
+        try:
+            while not self._streaming.closed:
+                update = await self._streaming.receive_update()
+
+                if isinstance(update, Exception):
+                    for queue in self._queues():
+                        await queue.put(update)
+                    continue
+
+                for queue in itertools.chain(
+                    self._by_reference_id.get(update.reference_id, ()),
+                    self._by_tag.get(update.tag, ()) if update.tag is not None else (),
+                ):
+                    await queue.put(update, update.reference_id)
+        finally:
+            for queue in self._queues():
+                await queue.close()
 
 
 @dataclass(frozen=True)
@@ -277,7 +754,40 @@ class _CreateSubscriptionResponse:
     refresh_rate: Optional[int] = None
 
 
+@dataclass(frozen=True)
+class SubscriptionRequest:
+    """Arguments of a subscription created in bulk by `StreamingSession.create_subscription_requests`.
+
+    Attributes:
+        request_job: Called to start the POST request creating the subscription, called again to re-create it.
+        delete_job: Called to delete the subscription on Saxobank before re-creating it under the same Reference ID.
+    """
+
+    request_job: Callable[[], Awaitable[Any]]
+    reference_id: ReferenceId
+    tag: Optional[str] = None
+    payload_decoders: Optional[Dict[int, PayloadDecoder]] = None
+    conflate: bool = False
+    endpoint: Optional[str] = None
+    raw: bool = False
+    list_key: Optional[str] = None
+    track_changes: bool = False
+    delete_job: Optional[Callable[[], Awaitable[Any]]] = None
+
+
+_CHART_CHARTS_SUBSCRIPTIONS_PATH = "chart/v1/charts/subscriptions"
+
+
+def _list_row_model(snapshot_model: type) -> Optional[type]:
+    # Model of rows of OData snapshot, e.g. PositionsRes of `Data: list[PositionsRes]`.
+    data = getattr(snapshot_model, "model_fields", {}).get("Data")
+    args = get_args(data.annotation) if data else ()
+    return args[0] if args and isinstance(args[0], type) else None
+
+
 class StreamingSession:
+    DEFAULT_MAX_CONCURRENT_REQUESTS: int = 16
+
     WS_AUTHORIZE_PATH: str = "authorize"
     WS_CONNECT_PATH: str = "connect"
 
@@ -288,15 +798,29 @@ class StreamingSession:
         ws_client: aiohttp.ClientSession,
         access_token: str,
         context_id: Optional[ContextId] = None,
+        json_codec: Optional[JsonCodec] = None,
+        max_buffer_bytes: int = FrameBuffer.DEFAULT_MAX_BYTES,
+        validation_policy: Optional[ValidationPolicy] = None,
     ) -> None:
         self._auth_url = urljoin(ws_base_url, self.WS_AUTHORIZE_PATH)
         self._connect_url = urljoin(ws_base_url, self.WS_CONNECT_PATH)
         self._user_session = user_session
         self._ws_client = ws_client
         self._context_id = context_id if context_id else ContextId()
+        self._codec = json_codec if json_codec else user_session.codec
+        self._max_buffer_bytes = max_buffer_bytes
+        self._validation_policy = (
+            validation_policy if validation_policy else user_session.validation_policy
+        )
         self.token = access_token
         self._subscriptions = Subscriptions()
         self._streaming: Optional[Streaming] = None
+        # Calls creating each subscription again, used when Saxobank resets it.
+        self._recreators: Dict[
+            ReferenceId, Callable[[], Awaitable[_CreateSubscriptionResponse]]
+        ] = {}
+        # Reset subscriptions failed to re-create, retried on the next reset or reconnection.
+        self._failed_recreations: Set[ReferenceId] = set()
 
     async def connect(self, message_id: Optional[int] = None) -> Streaming:
         params = model_streaming.ReqConnect(
@@ -305,14 +829,126 @@ class StreamingSession:
         headers = auth_header(self.token)
 
         self._streaming = Streaming(
-            await self._ws_client.ws_connect(
-                self._connect_url, params=params, headers=headers
-            ),
+            await self._ws_client.ws_connect(self._connect_url, params=params, headers=headers),
             self._subscriptions,
+            codec=self._codec,
+            max_buffer_bytes=self._max_buffer_bytes,
+            validation_policy=self._validation_policy,
         )
 
         return self._streaming
 
+    async def supervise(
+        self,
+        initial_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        max_attempts: Optional[int] = None,
+        refresh_token: Optional[Callable[[], Awaitable[str]]] = None,
+    ) -> AsyncIterator[Union[SnapshotUpdate, Exception]]:
+        """Stream updates over a connection kept alive.
+
+        The connection is re-established with exponential backoff whenever it is lost,
+        resuming from the last received message ID so that subscriptions don't need new snapshots.
+        Subscriptions reset by Saxobank are re-created, the others are left as they are.
+        Ones failed to re-create are reported by `exception.SubscriptionRecreationError`,
+        then retried on the next reset or reconnection.
+        Stream errors are yielded as well for information.
+
+        Disconnection by Saxobank needs authorization again, e.g. the client has reset password.
+        A new connection is made with the access token given by refresh_token, re-creating all subscriptions.
+        Supervising ends on disconnection without refresh_token.
+
+        Args:
+            initial_backoff: Seconds to wait before the first reconnection.
+            max_backoff: Upper limit of seconds to wait between reconnections.
+            max_attempts: Number of consecutive failed connections before giving up, unlimited if None.
+            refresh_token: Called for a new access token when Saxobank disconnects streaming.
+
+        Yields:
+            Snapshot updates and stream errors.
+
+        Raises:
+            aiohttp.ClientError: Connection failed max_attempts times in a row.
+        """
+        backoff = initial_backoff
+        attempts = 0
+        message_id: Optional[int] = None
+
+        while True:
+            try:
+                streaming = await self.connect(message_id)
+            except aiohttp.ClientError:
+                attempts += 1
+                if max_attempts is not None and max_attempts <= attempts:
+                    raise
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, max_backoff)
+                continue
+
+            backoff = initial_backoff
+            attempts = 0
+
+            if self._failed_recreations:
+                failure = await self._recreate_subscriptions(set())
+                if failure:
+                    yield failure
+
+            while True:
+                update = await streaming.receive_update()
+                failure = (
+                    await self._recreate_subscriptions(update.reference_ids)
+                    if isinstance(update, exception.ResetSubscriptionsError)
+                    else None
+                )
+                yield update
+                if failure:
+                    yield failure
+                if isinstance(
+                    update,
+                    (exception.StreamingConnectionLostError, exception.StreamingDisconnectError),
+                ):
+                    break
+
+            await streaming.disconnect()
+            if isinstance(update, exception.StreamingDisconnectError):
+                if refresh_token is None:
+                    return
+                self.token = await refresh_token()
+                # Nothing of the disconnected streaming is resumed, subscriptions are re-created after connecting.
+                message_id = None
+                self._failed_recreations.update(self._recreators)
+                continue
+
+            # Connection lost before any message keeps resuming from the previous one.
+            if streaming.last_message_id is not None:
+                message_id = streaming.last_message_id
+            await asyncio.sleep(backoff)
+
+    async def _recreate_subscriptions(
+        self, reference_ids: Iterable[ReferenceId]
+    ) -> Optional[exception.SubscriptionRecreationError]:
+        """Re-create reset subscriptions, along with ones failed to re-create before.
+
+        Returns:
+            Error of subscriptions failed to re-create, None if all of them succeeded.
+        """
+        targets = [
+            r for r in self._failed_recreations.union(reference_ids) if r in self._recreators
+        ]
+        results = await asyncio.gather(
+            *(self._recreators[r]() for r in targets), return_exceptions=True
+        )
+        self._failed_recreations = {
+            r
+            for r, res in zip(targets, results)
+            if isinstance(res, BaseException) or res.code.is_error
+        }
+        return (
+            exception.SubscriptionRecreationError(set(self._failed_recreations))
+            if self._failed_recreations
+            else None
+        )
+
     async def reauthorize(self, access_token: str) -> bool:
         self.token = access_token
         headers = auth_header(self.token)
@@ -330,14 +966,114 @@ class StreamingSession:
         tag: Optional[str] = None,
         # replace_reference_id: Optional[ReferenceId],
         # arguments: Optional[SaxobankModel],
+        payload_decoders: Optional[Dict[int, PayloadDecoder]] = None,
+        conflate: bool = False,
+        endpoint: Optional[str] = None,
+        raw: bool = False,
+        list_key: Optional[str] = None,
+        track_changes: bool = False,
     ) -> _CreateSubscriptionResponse:
+        """Register subscription and create it by request_job.
+
+        Args:
+            raw: Keep snapshot as decoded JSON and build model only when it's read, see `LazySnapshot`.
+            list_key: Key of rows to merge list snapshot in raw mode.
+            track_changes: Record changed fields and rows into `SnapshotUpdate.changes`.
+        """
         # assert self.streaming
         if not reference_id:
             reference_id = ReferenceId()
 
-        subscription = Subscription(reference_id, tag)
+        subscription = self._register_subscription(
+            reference_id, tag, payload_decoders, conflate, endpoint, raw, list_key, track_changes
+        )
+        return await self._complete_subscription(subscription, request_job)
+
+    async def create_subscription_requests(
+        self,
+        requests: Sequence[SubscriptionRequest],
+        max_concurrent_requests: int = DEFAULT_MAX_CONCURRENT_REQUESTS,
+    ) -> List[Union[_CreateSubscriptionResponse, BaseException]]:
+        """Create many subscriptions at once.
+
+        All subscriptions are registered before any request is sent, so that updates arriving early are kept.
+        Requests are sent concurrently, each of them still throttled by the rate limiter of user session.
+        Created subscriptions are re-created by `supervise` when Saxobank resets them.
+
+        Args:
+            requests: Subscriptions to create.
+            max_concurrent_requests: Upper limit of requests in flight.
+
+        Returns:
+            Response or raised exception of each request, in the order of requests.
+        """
+        semaphore = asyncio.Semaphore(max_concurrent_requests)
+        subscriptions = [self._register_request(r) for r in requests]
+
+        async def create(
+            request: SubscriptionRequest, subscription: Subscription
+        ) -> _CreateSubscriptionResponse:
+            async with semaphore:
+                return await self._complete_request(request, subscription)
+
+        return await asyncio.gather(
+            *(create(r, s) for r, s in zip(requests, subscriptions)), return_exceptions=True
+        )
+
+    def _register_request(self, request: SubscriptionRequest) -> Subscription:
+        return self._register_subscription(
+            request.reference_id,
+            request.tag,
+            request.payload_decoders,
+            request.conflate,
+            request.endpoint,
+            request.raw,
+            request.list_key,
+            request.track_changes,
+        )
+
+    async def _complete_request(
+        self,
+        request: SubscriptionRequest,
+        subscription: Subscription,
+        request_job: Optional[Awaitable[Any]] = None,
+    ) -> _CreateSubscriptionResponse:
+        res = await self._complete_subscription(
+            subscription, request_job if request_job else request.request_job()
+        )
+        if not res.code.is_error:
+            # request_job makes a new request on each call, so the same request re-creates it.
+            self._recreators[request.reference_id] = partial(self._recreate_request, request)
+        return res
+
+    async def _recreate_request(self, request: SubscriptionRequest) -> _CreateSubscriptionResponse:
+        # Saxobank keeps reset subscription until it's deleted, and rejects another one of its Reference ID.
+        # Error response of deleting it is ignored, e.g. Saxobank has dropped it already.
+        if request.delete_job:
+            await request.delete_job()
+        return await self._complete_request(request, self._register_request(request))
+
+    def _register_subscription(
+        self,
+        reference_id: ReferenceId,
+        tag: Optional[str],
+        payload_decoders: Optional[Dict[int, PayloadDecoder]],
+        conflate: bool,
+        endpoint: Optional[str],
+        raw: bool = False,
+        list_key: Optional[str] = None,
+        track_changes: bool = False,
+    ) -> Subscription:
+        subscription = Subscription(
+            reference_id, tag, payload_decoders, conflate, endpoint, raw, list_key, track_changes
+        )
         self._subscriptions.add(subscription)
+        return subscription
 
+    async def _complete_subscription(
+        self, subscription: Subscription, request_job: Awaitable[Any]
+    ) -> _CreateSubscriptionResponse:
+        reference_id = subscription.reference_id
         # req = endpoint.CHART_CHARTS_SUBSCRIPTIONS_POST.request_model(
         #     ContextId=self.context_id,
         #     ReferenceId=reference_id,
@@ -349,16 +1085,24 @@ class StreamingSession:
         # )
 
         # res = await self._user_session.chart_charts_subscription_post(req)
-        res = await request_job
+        try:
+            res = await request_job
+        except BaseException:
+            self._subscriptions.discard(subscription)
+            raise
 
         if res.code.is_error:
             self._subscriptions.discard(subscription)
             return _CreateSubscriptionResponse(res.code)
 
-        is_odata, next_callback = self._user_session.is_odata_response(res.model)
+        # List snapshot, e.g. positions, is paged by OData.
+        is_odata, next_callback = self._user_session.is_odata_response(res.model.Snapshot)
         snapshot = res.model.Snapshot.Data if is_odata else res.model.Snapshot
+        row_model = _list_row_model(type(res.model.Snapshot)) if is_odata else None
 
-        subscription._setup(res.model.InactivityTimeout, snapshot)
+        # Early deltas are merged, and raw snapshot builds its models later, under the policy of session.
+        with use_validation_policy(self._validation_policy):
+            snapshot = subscription._setup(res.model.InactivityTimeout, snapshot, row_model)
 
         # return streamer, next_callback if is_odata else None
         return _CreateSubscriptionResponse(
@@ -369,11 +1113,26 @@ class StreamingSession:
         self,
         reference_id: Optional[ReferenceId] = None,
         tag: Optional[str] = None,
-        format: Optional[str] = None,
+        format: Optional[SubscriptionFormat] = None,
         refresh_rate: Optional[int] = None,
         replace_reference_id: Optional[ReferenceId] = None,
-        arguments: Optional[SaxobankModel] = None,
+        arguments: Optional[ChartSubscriptionRequest] = None,
+        protobuf_message: Optional[type] = None,
+        conflate: bool = False,
+        track_changes: bool = False,
     ) -> _CreateSubscriptionResponse:
+        """Create chart subscription.
+
+        Args:
+            format: Format of streamed updates, defaults to JSON.
+            protobuf_message: Protobuf message class generated from the schema of chart subscriptions.
+                Required when format is `SubscriptionFormat.Protobuf`.
+            conflate: Emit only the latest snapshot when updates are received faster than consumed.
+            track_changes: Record times of samples changed into `SnapshotUpdate.changes`.
+        """
+        if format == SubscriptionFormat.Protobuf and not protobuf_message:
+            raise ValueError("protobuf_message is required for protobuf format.")
+
         reference_id = reference_id if reference_id else ReferenceId()
         req = endpoint.CHART_CHARTS_SUBSCRIPTIONS_POST.request_model(
             ContextId=self._context_id,
@@ -384,15 +1143,101 @@ class StreamingSession:
             ReplaceReferenceId=replace_reference_id,
             Arguments=arguments,
         )
-        coro = self._user_session.chart_charts_subscription_post(req)
-        return await self.create_subscription_request(coro, reference_id, tag)
+        payload_decoders = (
+            {PayloadFormat.Protobuf: protobuf_decoder(protobuf_message)}
+            if protobuf_message
+            else None
+        )
+        # Re-creation deletes the subscription first, it never replaces the one replaced already.
+        request = SubscriptionRequest(
+            partial(
+                self._user_session.chart_charts_subscription_post,
+                req.model_copy(update={"ReplaceReferenceId": None}),
+            ),
+            reference_id,
+            tag,
+            payload_decoders,
+            conflate,
+            _CHART_CHARTS_SUBSCRIPTIONS_PATH,
+            track_changes=track_changes,
+            delete_job=partial(self._delete_chart_subscription, reference_id),
+        )
+        return await self._complete_request(
+            request,
+            self._register_request(request),
+            self._user_session.chart_charts_subscription_post(req),
+        )
+
+    async def chart_charts_subscriptions_post(
+        self,
+        arguments: Sequence[ChartSubscriptionRequest],
+        format: Optional[SubscriptionFormat] = None,
+        refresh_rate: Optional[int] = None,
+        protobuf_message: Optional[type] = None,
+        conflate: bool = False,
+        track_changes: bool = False,
+        max_concurrent_requests: int = DEFAULT_MAX_CONCURRENT_REQUESTS,
+    ) -> List[Union[_CreateSubscriptionResponse, BaseException]]:
+        """Create chart subscriptions of many instruments at once.
+
+        Args:
+            arguments: Arguments of each chart subscription.
+            max_concurrent_requests: Upper limit of requests in flight.
+            Others are the same as `chart_charts_subscription_post`, shared by all subscriptions.
+
+        Returns:
+            Response or raised exception of each subscription, in the order of arguments.
+        """
+        if format == SubscriptionFormat.Protobuf and not protobuf_message:
+            raise ValueError("protobuf_message is required for protobuf format.")
+
+        payload_decoders = (
+            {PayloadFormat.Protobuf: protobuf_decoder(protobuf_message)}
+            if protobuf_message
+            else None
+        )
+        requests = []
+        for args in arguments:
+            reference_id = ReferenceId()
+            req = endpoint.CHART_CHARTS_SUBSCRIPTIONS_POST.request_model(
+                ContextId=self._context_id,
+                ReferenceId=reference_id,
+                Format=format,
+                RefreshRate=refresh_rate,
+                Arguments=args,
+            )
+            requests.append(
+                SubscriptionRequest(
+                    partial(self._user_session.chart_charts_subscription_post, req),
+                    reference_id,
+                    payload_decoders=payload_decoders,
+                    conflate=conflate,
+                    endpoint=_CHART_CHARTS_SUBSCRIPTIONS_PATH,
+                    track_changes=track_changes,
+                    delete_job=partial(self._delete_chart_subscription, reference_id),
+                )
+            )
+
+        return await self.create_subscription_requests(requests, max_concurrent_requests)
+
+    def _discard_subscription(self, reference_id: ReferenceId) -> None:
+        # Stop tracking subscription deleted by client, so that it's neither re-created nor timed out.
+        self._recreators.pop(reference_id, None)
+        self._failed_recreations.discard(reference_id)
+        try:
+            self._subscriptions.discard(self._subscriptions.get(reference_id))
+        except KeyError:
+            pass
 
     async def chart_charts_subscription_delete(self, reference_id):
-        print("called")
+        self._discard_subscription(reference_id)
+        return await self._delete_chart_subscription(reference_id)
+
+    async def _delete_chart_subscription(self, reference_id: ReferenceId) -> Any:
+        # Delete on Saxobank only, subscription is kept tracked, e.g. to re-create it.
         req = endpoint.CHART_CHARTS_SUBSCRIPTIONS_DELETE.request_model(
             ContextId=self._context_id, ReferenceId=reference_id
         )
-        print(f"req: {req}")
         return await self._user_session.chart_charts_subscription_delete(req)
 
     # async def closedpositions_remove_multiple_subscriptions(self, arguments) -> SaxobankModel:
@@ -403,3 +1248,192 @@ class StreamingSession:
     #     return await self.session.openapi_request(
     #         self.Endpoint.PORT_DELETE_CLOSEDPOSITIONS_SUBSCRIPTION_CONTEXTID, req, acess_token=access_token
     #     )
+
+
+def _normalize_arguments(arguments: Any) -> Hashable:
+    # Hashable form of request arguments, independent of key order and of unset fields.
+    if isinstance(arguments, SaxobankModel):
+        return _normalize_arguments(arguments.as_request_body())
+    if is_dataclass(arguments) and not isinstance(arguments, type):
+        return _normalize_arguments({k: v for k, v in asdict(arguments).items() if v is not None})
+    if isinstance(arguments, dict):
+        return tuple(sorted((k, _normalize_arguments(v)) for k, v in arguments.items()))
+    if isinstance(arguments, (list, tuple)):
+        return tuple(_normalize_arguments(v) for v in arguments)
+    return cast(Hashable, arguments)
+
+
+@dataclass
+class _SharedSubscription:
+    creation: "asyncio.Future[_CreateSubscriptionResponse]"
+    delete: Callable[[ReferenceId], Awaitable[Any]]
+    handles: int = 0
+
+
+class SubscriptionHandle:
+    """Consumer handle of a subscription shared by `SubscriptionMultiplexer`.
+
+    Attributes:
+        updates: Queue of its own receiving every snapshot of the subscription,
+            None unless multiplexer has a distributor.
+    """
+
+    def __init__(
+        self,
+        multiplexer: "SubscriptionMultiplexer",
+        key: Hashable,
+        response: _CreateSubscriptionResponse,
+        updates: Optional[DistributionQueue] = None,
+    ) -> None:
+        self._multiplexer = multiplexer
+        self._key = key
+        self.response = response
+        self.updates = updates
+        # Failed subscription has nothing to release.
+        self.closed = response.code.is_error
+
+    @property
+    def reference_id(self) -> Optional[ReferenceId]:
+        return self.response.reference_id
+
+    async def close(self) -> None:
+        """Release the handle, the subscription is deleted when the last handle is closed."""
+        if self.closed:
+            return
+        self.closed = True
+        await self._multiplexer._release(self._key, self.updates)
+
+    async def __aenter__(self) -> "SubscriptionHandle":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        await self.close()
+
+
+class SubscriptionMultiplexer:
+    """Share one subscription among consumers asking for the same endpoint and arguments.
+
+    Saxobank subscription is created by the first consumer and deleted when the last one closes its handle.
+    Consumers asking while it's being created wait for the same request.
+    Given a distributor, each handle gets a queue of its own receiving every snapshot,
+    bounded by maxsize and overflow policy.
+    """
+
+    def __init__(
+        self,
+        session: StreamingSession,
+        distributor: Optional[Distributor] = None,
+        maxsize: int = 64,
+        overflow: OverflowPolicy = OverflowPolicy.Block,
+    ) -> None:
+        self._session = session
+        self._distributor = distributor
+        self._maxsize = maxsize
+        self._overflow = overflow
+        self._shared: Dict[Hashable, _SharedSubscription] = {}
+
+    def __len__(self) -> int:
+        return len(self._shared)
+
+    async def subscribe(
+        self,
+        key: Hashable,
+        create: Callable[[], Awaitable[_CreateSubscriptionResponse]],
+        delete: Callable[[ReferenceId], Awaitable[Any]],
+    ) -> SubscriptionHandle:
+        """Handle of subscription identified by key, created if no consumer holds it.
+
+        Args:
+            key: Identity of subscription, typically endpoint and normalized arguments.
+            create: Called to create the subscription.
+            delete: Called with Reference ID to delete the subscription.
+
+        Returns:
+            Handle of the subscription, already closed if creating it failed.
+        """
+        shared = self._shared.get(key)
+        if shared is None:
+            shared = _SharedSubscription(asyncio.ensure_future(create()), delete)
+            self._shared[key] = shared
+
+        # Count before waiting, so that a handle closed meanwhile doesn't delete the subscription.
+        shared.handles += 1
+        try:
+            response = await asyncio.shield(shared.creation)
+        except BaseException:
+            shared.handles -= 1
+            if shared.creation.done():
+                self._forget(key, shared)
+            raise
+
+        if response.code.is_error:
+            self._forget(key, shared)
+            return SubscriptionHandle(self, key, response)
+
+        updates = (
+            self._distributor.stream(
+                response.reference_id, maxsize=self._maxsize, overflow=self._overflow, shared=False
+            )
+            if self._distributor
+            else None
+        )
+        return SubscriptionHandle(self, key, response, updates)
+
+    def _forget(self, key: Hashable, shared: _SharedSubscription) -> None:
+        if self._shared.get(key) is shared:
+            del self._shared[key]
+
+    async def _release(self, key: Hashable, updates: Optional[DistributionQueue] = None) -> None:
+        if updates is not None and self._distributor:
+            await self._distributor.detach(updates)
+
+        shared = self._shared[key]
+        shared.handles -= 1
+        if shared.handles:
+            return
+
+        del self._shared[key]
+        reference_id = cast(ReferenceId, shared.creation.result().reference_id)
+        self._session._discard_subscription(reference_id)
+        await shared.delete(reference_id)
+
+    async def chart_charts_subscription_post(
+        self,
+        arguments: ChartSubscriptionRequest,
+        format: Optional[SubscriptionFormat] = None,
+        refresh_rate: Optional[int] = None,
+        protobuf_message: Optional[type] = None,
+        conflate: bool = False,
+        track_changes: bool = False,
+    ) -> SubscriptionHandle:
+        """Handle of chart subscription, shared with consumers of the same arguments.
+
+        Args are the same as `StreamingSession.chart_charts_subscription_post`.
+        """
+        key = (
+            _CHART_CHARTS_SUBSCRIPTIONS_PATH,
+            format,
+            refresh_rate,
+            protobuf_message,
+            conflate,
+            track_changes,
+            _normalize_arguments(arguments),
+        )
+        create = partial(
+            self._session.chart_charts_subscription_post,
+            None,
+            None,
+            format,
+            refresh_rate,
+            None,
+            arguments,
+            protobuf_message,
+            conflate,
+            track_changes,
+        )
+        return await self.subscribe(key, create, self._session.chart_charts_subscription_delete)
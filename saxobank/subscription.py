@@ -2,13 +2,224 @@ from __future__ import annotations
 
 import asyncio
 import collections
-from collections.abc import Container
+import heapq
+import itertools
+from dataclasses import dataclass, field, fields, is_dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Any, Collection, Iterator, Optional, Set, Union, cast
+from enum import Enum
+from typing import (
+    Any,
+    Callable,
+    Collection,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+    cast,
+)
 
 from .common import is_aware_datetime
-from .model.base import SaxobankModel
+from .exception import InvalidPartitionError
+from .model.base import (
+    ReadOnlyList,
+    SaxobankModel,
+    SaxobankModel2,
+    format_timestamp,
+    merge_keyed_rows,
+)
 from .model.common import ReferenceId
+from .validation import ValidationPolicy, current_validation_policy, use_validation_policy
+
+PayloadDecoder = Callable[[memoryview], Any]
+# Deadline, sequence to break ties and subscription.
+_DeadlineEntry = Tuple[datetime, int, "Subscription"]
+
+_UNSET: Any = object()
+
+FieldPath = Tuple[str, ...]
+
+# Keys of partitioned delta, dropped from the assembled one.
+_PARTITION_KEYS = frozenset(("PartitionNumber", "TotalPartition"))
+
+
+@dataclass
+class ChangeSet:
+    """Fields changed by deltas since the previous update.
+
+    Changes of several deltas, e.g. conflated ones, are accumulated into one change set.
+
+    Attributes:
+        paths: Paths of changed fields, e.g. ("Quote", "Bid"). Empty path means the whole snapshot.
+        inserted: Keys of rows inserted into list snapshot merged by list key.
+        updated: Keys of rows updated.
+        deleted: Keys of rows deleted.
+    """
+
+    paths: Set[FieldPath] = field(default_factory=set)
+    inserted: Set[Hashable] = field(default_factory=set)
+    updated: Set[Hashable] = field(default_factory=set)
+    deleted: Set[Hashable] = field(default_factory=set)
+
+    def __bool__(self) -> bool:
+        return bool(self.paths or self.inserted or self.updated or self.deleted)
+
+    def record(self, delta: Any, path: FieldPath = ()) -> None:
+        """Record fields of decoded JSON delta as changed."""
+        if isinstance(delta, dict) and delta:
+            for key, value in delta.items():
+                self.record(value, path + (key,))
+        else:
+            self.paths.add(path)
+
+    def row_inserted(self, key: Hashable) -> None:
+        if key in self.deleted:
+            self.deleted.discard(key)
+            self.updated.add(key)
+        else:
+            self.inserted.add(key)
+
+    def row_updated(self, key: Hashable) -> None:
+        if key not in self.inserted:
+            self.updated.add(key)
+
+    def row_deleted(self, key: Hashable) -> None:
+        if key in self.inserted:
+            self.inserted.discard(key)
+        else:
+            self.updated.discard(key)
+            self.deleted.add(key)
+
+
+def merge_raw(
+    state: Any,
+    delta: Any,
+    list_key: Optional[str] = None,
+    changes: Optional[ChangeSet] = None,
+    path: FieldPath = (),
+) -> Any:
+    """Decoded JSON state with decoded JSON delta merged.
+
+    Objects are merged recursively, the other values are replaced.
+    Lists of rows are merged by list_key when given, see `saxobank.model.base.merge_keyed_rows`.
+    Rows marked with `__meta_deleted` are removed, delta rows without list_key are appended.
+    State is never modified, unchanged objects and rows are shared with the result.
+
+    Args:
+        changes: Change set to record changed fields and rows into.
+        path: Path of state in the whole snapshot, prefixed to recorded paths.
+    """
+    if isinstance(state, dict) and isinstance(delta, dict):
+        merged = dict(state)
+        for key, value in delta.items():
+            if key in merged:
+                merged[key] = merge_raw(merged[key], value, list_key, changes, path + (key,))
+            else:
+                merged[key] = value
+                if changes is not None:
+                    changes.record(value, path + (key,))
+        return merged
+
+    if list_key and isinstance(state, list) and isinstance(delta, list):
+        merged_rows = merge_keyed_rows(
+            state,
+            delta,
+            lambda row: row.get(list_key) if isinstance(row, dict) else None,
+            lambda row: isinstance(row, dict) and row.get("__meta_deleted"),
+            merge_raw,
+            changes,
+        )
+        if changes is not None:
+            changes.paths.add(path)
+        return merged_rows
+
+    if changes is not None:
+        changes.record(delta, path)
+    return delta
+
+
+def _as_raw(snapshot: Any) -> Any:
+    # Decoded JSON form of snapshot, so that values such as keys of rows compare equal with ones of deltas.
+    if isinstance(snapshot, SaxobankModel):
+        return snapshot.model_dump(mode="json", by_alias=True, exclude_unset=True)
+    if is_dataclass(snapshot) and not isinstance(snapshot, type):
+        return {f.name: _as_raw(getattr(snapshot, f.name)) for f in fields(snapshot)}
+    if isinstance(snapshot, (list, tuple)):
+        return [_as_raw(row) for row in snapshot]
+    if isinstance(snapshot, dict):
+        return {key: _as_raw(value) for key, value in snapshot.items()}
+    if isinstance(snapshot, datetime):
+        return format_timestamp(snapshot)
+    if isinstance(snapshot, Enum):
+        return snapshot.value
+    return snapshot
+
+
+def _model_factory(
+    snapshot: Any, policy: Optional[ValidationPolicy] = None, row_model: Optional[type] = None
+) -> Callable[[Any], Any]:
+    # Build the same type of snapshot given by subscription response, under policy if given.
+    # Rows of list snapshot are built into row_model, or the type of its first row.
+    if policy is not None:
+        factory = _model_factory(snapshot, None, row_model)
+
+        def build(raw: Any) -> Any:
+            with use_validation_policy(policy):
+                return factory(raw)
+
+        return build
+
+    if isinstance(snapshot, list):
+        row_factory = _class_factory(row_model or (type(snapshot[0]) if snapshot else None))
+        return lambda raw: ReadOnlyList(row_factory(row) for row in raw)
+    return _class_factory(type(snapshot))
+
+
+def _class_factory(cls: Optional[type]) -> Callable[[Any], Any]:
+    if cls is not None and issubclass(cls, SaxobankModel):
+        return cls.model_validate
+    if cls is not None and issubclass(cls, SaxobankModel2):
+        return lambda raw: cls(**raw)
+    return lambda raw: raw
+
+
+class LazySnapshot:
+    """Snapshot kept as decoded JSON, typed model is built only when it's read.
+
+    Deltas are merged into the decoded JSON without validation, each of them gives a new snapshot.
+    Model is built once per snapshot and cached, snapshots never read are never validated.
+
+    Attributes:
+        raw: Decoded JSON of the snapshot, must not be modified.
+    """
+
+    __slots__ = ("raw", "_factory", "_list_key", "_model")
+
+    def __init__(
+        self, raw: Any, factory: Callable[[Any], Any], list_key: Optional[str] = None
+    ) -> None:
+        self.raw = raw
+        self._factory = factory
+        self._list_key = list_key
+        self._model = _UNSET
+
+    @property
+    def model(self) -> Any:
+        if self._model is _UNSET:
+            self._model = self._factory(self.raw)
+        return self._model
+
+    def apply_delta(
+        self, delta: Any, changes: Optional[ChangeSet] = None
+    ) -> Tuple[LazySnapshot, bool]:
+        merged = merge_raw(self.raw, delta, self._list_key, changes)
+        return LazySnapshot(merged, self._factory, self._list_key), False
+
 
 # class BaseSubscription(abc.ABC):
 #     def __init__(self, user_session: UserSession, context_id: ContextId, reference_id: ReferenceId) -> None:
@@ -79,21 +290,57 @@ from .model.common import ReferenceId
 class Subscription:
     # delta_model: SaxobankModel = None
 
+    # Partial set of partitioned deltas older than this is dropped, see expire_partitions.
+    partition_timeout = timedelta(seconds=30)
+
     def __init__(
-        self, reference_id: Union[ReferenceId, str], tag: Optional[str] = None
+        self,
+        reference_id: Union[ReferenceId, str],
+        tag: Optional[str] = None,
+        payload_decoders: Optional[Mapping[int, PayloadDecoder]] = None,
+        conflate: bool = False,
+        endpoint: Optional[str] = None,
+        raw: bool = False,
+        list_key: Optional[str] = None,
+        track_changes: bool = False,
     ) -> None:
         self.reference_id = (
-            reference_id
-            if isinstance(reference_id, ReferenceId)
-            else ReferenceId(reference_id)
+            reference_id if isinstance(reference_id, ReferenceId) else ReferenceId(reference_id)
         )
         self.tag = tag
+        # Path of endpoint which created the subscription.
+        self.endpoint = endpoint
+        # Keep snapshot as decoded JSON, see LazySnapshot.
+        self.raw = raw
+        # Key of rows to merge list snapshot in raw mode, e.g. "PositionId".
+        self.list_key = list_key
+        # Decoders keyed by payload format byte, used before ones of streaming.
+        self.payload_decoders: Mapping[int, PayloadDecoder] = payload_decoders or {}
+        # Merge updates already received into one snapshot, instead of emitting each of them.
+        self.conflate = conflate
+        self._coalesced = 0
+        # Record changed fields and rows of each update, see pop_changes.
+        self.track_changes = track_changes
 
         # Post setups
         self._preparation = asyncio.Event()
         self._snapshot: Optional[SaxobankModel] = None
+        # Deltas arrived before the snapshot, replayed on setup.
+        self._early_deltas: List[Any] = []
+        # Partitions of the delta being assembled, in slots by zero-based partition number.
+        self._partitions: Optional[List[Any]] = None
+        self._partitions_received = 0
+        self._partitions_expire_at: Optional[datetime] = None
+        self.expired_partitions = 0
+        # Set while under Subscriptions, holding subscriptions with a partial set to expire when idle.
+        self._partial_sets: Optional[Set[Subscription]] = None
+        # Changes applied since the last emitted update, None unless changes are tracked.
+        self._changes: Optional[ChangeSet] = ChangeSet() if track_changes else None
         self._inactivity_timeout: Optional[timedelta] = None
         self._timeout_after: Optional[datetime] = None
+        # Set while under Subscriptions, to schedule the deadline when it's set for the first time.
+        self._scheduler: Optional[Callable[[Subscription], None]] = None
+        self._deadline_entry: Optional[_DeadlineEntry] = None
 
     def __hash__(self) -> int:
         return hash((self.__class__, self.reference_id))
@@ -103,19 +350,71 @@ class Subscription:
             return False
         return hash(self) == hash(o)
 
-    def _setup(self, inactivity_timeout_secs: int, snapshot: SaxobankModel) -> None:
+    def _setup(
+        self,
+        inactivity_timeout_secs: int,
+        snapshot: SaxobankModel,
+        row_model: Optional[type] = None,
+    ) -> SaxobankModel:
+        """Set the snapshot of subscription response and replay deltas arrived before it.
+
+        In raw mode, snapshot is turned into `LazySnapshot` building the same type of model,
+        under the validation policy active at setup rather than the one of whoever reads it.
+
+        List snapshot, e.g. positions, is always kept in raw mode, as rows of its deltas carry changed fields only.
+        Rows are merged by `_list_key` of row model unless list_key is given.
+
+        Args:
+            row_model: Model of rows of list snapshot, needed when snapshot is empty.
+
+        Returns:
+            Snapshot with early deltas applied.
+        """
         assert not self._preparation.is_set()
 
         self._inactivity_timeout = timedelta(seconds=inactivity_timeout_secs)
-        self._snapshot = snapshot
+        if isinstance(snapshot, list):
+            row_model = row_model or (type(snapshot[0]) if snapshot else None)
+            self.raw = True
+            self.list_key = self.list_key or getattr(row_model, "_list_key", None)
+        if self.raw:
+            factory = _model_factory(snapshot, current_validation_policy(), row_model)
+            self._snapshot = LazySnapshot(_as_raw(snapshot), factory, self.list_key)
+        else:
+            self._snapshot = snapshot
+        early_deltas, self._early_deltas = self._early_deltas, []
+        for delta in early_deltas:
+            self.apply_delta(delta)
+        # Returned snapshot contains early deltas already.
+        self._changes = ChangeSet() if self.track_changes else None
         self._preparation.set()
 
+        return self._snapshot
+
+    @property
+    def is_prepared(self) -> bool:
+        return self._preparation.is_set()
+
     async def wait_preparation(self) -> None:
         await self._preparation.wait()
 
+    def defer_delta(self, delta: Any) -> None:
+        """Keep delta arrived before setup, to apply it onto the snapshot later.
+
+        Raises:
+            InvalidPartitionError: Partition number is out of the total partitions.
+        """
+        assert not self.is_prepared
+        partition = self._partition_of(delta)
+        if partition is not None:
+            self._check_partition(*partition)
+        self._early_deltas.append(delta)
+
     def extend_timeout(self) -> None:
         if self._inactivity_timeout:
             self._timeout_after = datetime.now(timezone.utc) + self._inactivity_timeout
+            if self._deadline_entry is None and self._scheduler:
+                self._scheduler(self)
 
     def is_timed_out(self, evaluate_at: datetime) -> bool:
         assert is_aware_datetime(evaluate_at)
@@ -123,53 +422,245 @@ class Subscription:
 
     @property
     def snapshot(self) -> SaxobankModel:
+        """Latest snapshot.
+
+        Snapshot is never modified, deltas are applied onto a new one sharing unchanged fields.
+        Thus it's returned without copying and stays valid after further deltas.
+        Snapshot models are frozen and their lists are read-only, see `ReadOnlyList`,
+        so that consumers can't modify it either.
+        """
         if not self._snapshot:
             raise RuntimeError
 
-        return self._snapshot.copy()
+        return self._snapshot
 
     def apply_delta(self, delta: Any) -> Optional[SaxobankModel]:
+        """Apply delta onto the snapshot.
+
+        Partitioned delta is held until all partitions of the set arrive,
+        then they are applied as one delta, rows of their Data joined in order of partitions.
+        Partial set is dropped once it expires, or when a whole delta arrives which supersedes it.
+
+        Returns:
+            Updated snapshot, or None while partitions are missing.
+
+        Raises:
+            InvalidPartitionError: Partition number is out of the total partitions.
+        """
         assert self._snapshot is not None
-        self._snapshot, is_parted = self.snapshot.apply_delta(delta)
 
+        partition = self._partition_of(delta)
+        if self._partitions is not None:
+            if partition is None:
+                self._drop_partitions()
+            else:
+                self.expire_partitions(datetime.now(timezone.utc))
+        if partition is not None:
+            delta = self._assemble_partition(delta, *partition)
+            if delta is None:
+                return None
+
+        self._snapshot, is_parted = self._apply(self._snapshot, delta)
         return cast(SaxobankModel, self._snapshot) if not is_parted else None
 
+    def _apply(self, snapshot: Any, delta: Any) -> Tuple[Any, bool]:
+        changes = self._changes
+        if changes is None:
+            return snapshot.apply_delta(delta)
+        # Merges of these record changed rows by their keys, which delta alone doesn't tell.
+        if isinstance(snapshot, (LazySnapshot, SaxobankModel2)):
+            return snapshot.apply_delta(delta, changes)
+        changes.record(delta)
+        return snapshot.apply_delta(delta)
+
+    def pop_changes(self) -> Optional[ChangeSet]:
+        """Changes applied since the previous call, then start a new change set.
+
+        Returns:
+            Changes, or None unless the subscription tracks changes.
+        """
+        changes = self._changes
+        if changes is not None:
+            self._changes = ChangeSet()
+        return changes
+
+    @staticmethod
+    def _partition_of(delta: Any) -> Optional[Tuple[int, int]]:
+        # Partition number and total of decoded JSON delta, see saxobank.model.base._RespPartedStreaming.
+        if not isinstance(delta, dict):
+            return None
+        number, total = delta.get("PartitionNumber"), delta.get("TotalPartition")
+        return None if number is None or total is None else (number, total)
+
+    def expire_partitions(self, evaluate_at: datetime) -> bool:
+        """Drop the partial set of partitions if it has expired.
+
+        Returns:
+            True if the partial set was dropped.
+        """
+        expire_at = self._partitions_expire_at
+        if expire_at is None or evaluate_at <= expire_at:
+            return False
+
+        self._drop_partitions()
+        return True
+
+    def _drop_partitions(self) -> None:
+        self._partitions = None
+        self._partitions_received = 0
+        self._partitions_expire_at = None
+        self.expired_partitions += 1
+        if self._partial_sets is not None:
+            self._partial_sets.discard(self)
+
+    def _check_partition(self, number: int, total: int) -> None:
+        if not 0 <= number < total:
+            raise InvalidPartitionError(self.reference_id, number, total)
+
+    def _assemble_partition(
+        self, delta: Dict[str, Any], number: int, total: int
+    ) -> Optional[Dict[str, Any]]:
+        self._check_partition(number, total)
+
+        slots = self._partitions
+        if slots is not None and len(slots) != total:
+            self._drop_partitions()
+            slots = None
+        if slots is None:
+            slots = self._partitions = [None] * total
+            self._partitions_expire_at = datetime.now(timezone.utc) + self.partition_timeout
+            if self._partial_sets is not None:
+                self._partial_sets.add(self)
+
+        if slots[number] is None:
+            self._partitions_received += 1
+        slots[number] = delta
+
+        if self._partitions_received < total:
+            return None
+
+        self._partitions = None
+        self._partitions_received = 0
+        self._partitions_expire_at = None
+        if self._partial_sets is not None:
+            self._partial_sets.discard(self)
+        # Fields other than Data are taken from the last partition.
+        assembled = {k: v for k, v in slots[-1].items() if k not in _PARTITION_KEYS}
+        assembled["Data"] = [row for part in slots for row in part.get("Data") or ()]
+        return assembled
+
 
 class Subscriptions(collections.abc.MutableSet):
+    """Subscriptions under observation of a streaming.
+
+    Subscriptions are keyed by Reference ID, and indexed by tag and by endpoint as well.
+
+    Inactivity deadlines are kept in a min-heap, invalidated lazily.
+    Extending timeout of a subscription only updates its deadline, and expired entries of the heap are
+    re-scheduled to the extended deadline when they are popped.
+    """
+
     def __init__(self) -> None:
-        self._subscriptions: Set[Subscription] = set()
+        self._subscriptions: Dict[ReferenceId, Subscription] = {}
+        self._by_tag: Dict[str, Dict[ReferenceId, Subscription]] = {}
+        self._by_endpoint: Dict[str, Dict[ReferenceId, Subscription]] = {}
+        self._deadlines: List[_DeadlineEntry] = []
+        self._sequence = itertools.count()
+        # Subscriptions holding a partial set of partitions.
+        self._partial_sets: Set[Subscription] = set()
 
     def __contains__(self, o: object) -> bool:
-        return o in self._subscriptions
+        return isinstance(o, Subscription) and self._subscriptions.get(o.reference_id) is o
 
     def __iter__(self) -> Iterator[Subscription]:
-        return iter(self._subscriptions)
+        return iter(self._subscriptions.values())
 
     def __len__(self) -> int:
         return len(self._subscriptions)
 
     def get(self, reference_id: Union[ReferenceId, str]) -> Subscription:
-        for s in self._subscriptions:
-            if s.reference_id == reference_id:
-                return s
-        raise KeyError
+        return self._subscriptions[reference_id]
 
     def reference_ids(self) -> Set[ReferenceId]:
-        return {subscription.reference_id for subscription in self._subscriptions}
+        return set(self._subscriptions)
+
+    def with_tag(self, tag: str) -> List[Subscription]:
+        return list(self._by_tag.get(tag, {}).values())
+
+    def with_endpoint(self, endpoint: str) -> List[Subscription]:
+        return list(self._by_endpoint.get(endpoint, {}).values())
+
+    @staticmethod
+    def _index(
+        index: Dict[str, Dict[ReferenceId, Subscription]],
+        key: Optional[str],
+        subscription: Subscription,
+    ) -> None:
+        if key is not None:
+            index.setdefault(key, {})[subscription.reference_id] = subscription
+
+    @staticmethod
+    def _unindex(
+        index: Dict[str, Dict[ReferenceId, Subscription]],
+        key: Optional[str],
+        subscription: Subscription,
+    ) -> None:
+        if key is None:
+            return
+        indexed = index[key]
+        del indexed[subscription.reference_id]
+        if not indexed:
+            del index[key]
 
     def add(self, subscription: Subscription) -> None:
         assert isinstance(subscription, Subscription)
-        self._subscriptions.add(subscription)
+        replaced = self._subscriptions.get(subscription.reference_id)
+        if replaced is not None:
+            self.discard(replaced)
+
+        self._subscriptions[subscription.reference_id] = subscription
+        self._index(self._by_tag, subscription.tag, subscription)
+        self._index(self._by_endpoint, subscription.endpoint, subscription)
+        subscription._scheduler = self._schedule
+        subscription._partial_sets = self._partial_sets
+        if subscription._timeout_after:
+            self._schedule(subscription)
+        if subscription._partitions is not None:
+            self._partial_sets.add(subscription)
 
     def discard(self, subscription: Subscription) -> None:
         assert isinstance(subscription, Subscription)
-        self._subscriptions.discard(subscription)
+        if subscription in self:
+            del self._subscriptions[subscription.reference_id]
+            self._unindex(self._by_tag, subscription.tag, subscription)
+            self._unindex(self._by_endpoint, subscription.endpoint, subscription)
+            subscription._scheduler = None
+            subscription._deadline_entry = None
+            subscription._partial_sets = None
+            self._partial_sets.discard(subscription)
+
+    def clear(self) -> None:
+        for subscription in self._subscriptions.values():
+            subscription._scheduler = None
+            subscription._deadline_entry = None
+            subscription._partial_sets = None
+        self._subscriptions.clear()
+        self._by_tag.clear()
+        self._by_endpoint.clear()
+        self._deadlines.clear()
+        self._partial_sets.clear()
+
+    def _schedule(self, subscription: Subscription) -> None:
+        entry = (cast(datetime, subscription._timeout_after), next(self._sequence), subscription)
+        subscription._deadline_entry = entry
+        heapq.heappush(self._deadlines, entry)
 
     def remove_items(
         self,
         subscriptions: Optional[Collection[Subscription]] = None,
         reference_ids: Optional[Collection[ReferenceId]] = None,
         tag: Optional[str] = None,
+        endpoint: Optional[str] = None,
     ) -> None:
         if subscriptions:
             for s in subscriptions:
@@ -179,20 +670,46 @@ class Subscriptions(collections.abc.MutableSet):
             self.remove_items(subscriptions={self.get(r) for r in reference_ids})
 
         elif tag:
-            self.remove_items(
-                subscriptions={s for s in self._subscriptions if s.tag == tag}
-            )
+            self.remove_items(subscriptions=self.with_tag(tag))
+
+        elif endpoint:
+            self.remove_items(subscriptions=self.with_endpoint(endpoint))
 
     def remove_timeouts(self, evaluate_at: datetime) -> Set[ReferenceId]:
         assert is_aware_datetime(evaluate_at)
 
-        timeouts = {s for s in self._subscriptions if s.is_timed_out(evaluate_at)}
+        timeouts = set()
+        while self._deadlines and self._deadlines[0][0] < evaluate_at:
+            entry = heapq.heappop(self._deadlines)
+            subscription = entry[2]
+            # Entry was superseded or subscription was removed.
+            if subscription._deadline_entry is not entry:
+                continue
+
+            subscription._deadline_entry = None
+            if subscription.is_timed_out(evaluate_at):
+                timeouts.add(subscription)
+            else:
+                self._schedule(subscription)
+
         for subscription in timeouts:
-            self.remove(subscription)
+            self.discard(subscription)
         return {s.reference_id for s in timeouts}
 
-    def extend_timeout(self, reference_ids: Container[ReferenceId]) -> None:
-        for subscription in {
-            s for s in self._subscriptions if s.reference_id in reference_ids
-        }:
-            subscription.extend_timeout()
+    def expire_partitions(self, evaluate_at: datetime) -> Set[ReferenceId]:
+        """Drop partial sets of partitions which have expired, see Subscription.expire_partitions.
+
+        Returns:
+            Reference IDs of subscriptions whose partial set was dropped.
+        """
+        assert is_aware_datetime(evaluate_at)
+
+        return {
+            s.reference_id for s in list(self._partial_sets) if s.expire_partitions(evaluate_at)
+        }
+
+    def extend_timeout(self, reference_ids: Iterable[ReferenceId]) -> None:
+        for reference_id in reference_ids:
+            subscription = self._subscriptions.get(reference_id)
+            if subscription:
+                subscription.extend_timeout()
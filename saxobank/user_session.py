@@ -12,11 +12,13 @@ import pydantic
 from pydantic import parse_obj_as
 
 from . import endpoint, exception, model
+from .codec import STDLIB_CODEC, JsonCodec
 from .common import auth_header
 from .endpoint import ContentType, Dimension, HttpMethod
 from .environment import RestBaseUrl
 from .model.base import ErrorResponse, ODataResponse, SaxobankModel, SaxobankModel2
 from .model.common import ResponseCode
+from .validation import STRICT_VALIDATION, ValidationPolicy, use_validation_policy
 
 
 class RateLimiter:
@@ -48,11 +50,15 @@ class UserSession:
         http_client: aiohttp.ClientSession,
         rate_limiter: RateLimiter,
         access_token: str | None = None,
+        json_codec: JsonCodec = STDLIB_CODEC,
+        validation_policy: ValidationPolicy = STRICT_VALIDATION,
     ):
         self.base_url = rest_base_url
         self.http = http_client
         self.limiter = rate_limiter
         self.token = access_token
+        self.codec = json_codec
+        self.validation_policy = validation_policy
 
     async def openapi_request(
         self,
@@ -105,16 +111,21 @@ class UserSession:
             ) as response:
                 info = response.request_info
                 code = ResponseCode(response.status)
-                json = await response.json() if response.content_type == ContentType.JSON else None
+                json = (
+                    self._loads(await response.read())
+                    if response.content_type == ContentType.JSON
+                    else None
+                )
 
             error_response = self.error_response(code, json)
             if error_response:
                 return _OpenApiRequestResponse(code, error_response, None)
 
             # response_model = endpoint.response_model.parse_obj(json) if endpoint.response_model else None
-            response_model = (
-                parse_obj_as(endpoint.response_model, json) if endpoint.response_model else None
-            )
+            with use_validation_policy(self.validation_policy):
+                response_model = (
+                    parse_obj_as(endpoint.response_model, json) if endpoint.response_model else None
+                )
             is_odata, next_callback = self.is_odata_response(response_model)
 
             return _OpenApiRequestResponse(
@@ -186,16 +197,21 @@ class UserSession:
             ) as response:
                 info = response.request_info
                 code = ResponseCode(response.status)
-                json = await response.json() if response.content_type == ContentType.JSON else None
+                json = (
+                    self._loads(await response.read())
+                    if response.content_type == ContentType.JSON
+                    else None
+                )
 
             error_response = self.error_response(code, json)
             if error_response:
                 return _OpenApiRequestResponse(code, error_response, None)
 
             # response_model = endpoint.response_model.parse_obj(json) if endpoint.response_model else None
-            response_model = (
-                parse_obj_as(endpoint.response_model, json) if endpoint.response_model else None
-            )
+            with use_validation_policy(self.validation_policy):
+                response_model = (
+                    parse_obj_as(endpoint.response_model, json) if endpoint.response_model else None
+                )
             is_odata, next_callback = self.is_odata_response(response_model)
 
             return _OpenApiRequestResponse(
@@ -215,6 +231,10 @@ class UserSession:
             print(str(info))
             raise exception.InternalError(str(ex) + f"\r\nResponce was: {json}")
 
+    def _loads(self, body: bytes) -> Any:
+        # Empty body, e.g. of 202 or 204 responses, is None as aiohttp's response.json() gives.
+        return self.codec.loads(body) if body.strip() else None
+
     @classmethod
     def error_response(
         cls, code: ResponseCode, json: Optional[Any] = None
@@ -245,12 +265,12 @@ class UserSession:
         return True, partial(self.openapi_request, next_endpoint, next_request_model)
 
     # Chart
-    # chart_charts_subscription_delete = partialmethod(
-    #     openapi_request, endpoint.CHART_CHARTS_SUBSCRIPTIONS_DELETE
-    # )
-    # chart_charts_subscription_post = partialmethod(
-    #     openapi_request, endpoint.CHART_CHARTS_SUBSCRIPTIONS_POST
-    # )
+    chart_charts_subscription_delete = partialmethod(
+        openapi_request, endpoint.CHART_CHARTS_SUBSCRIPTIONS_DELETE
+    )
+    chart_charts_subscription_post = partialmethod(
+        openapi_request, endpoint.CHART_CHARTS_SUBSCRIPTIONS_POST
+    )
 
     # Portfolio
     # port_clients_me_get = partialmethod(openapi_request, endpoint.PORT_CLIENTS_ME_GET)
@@ -0,0 +1,94 @@
+"""Validation level of models built from inbound data.
+
+Type checks of `saxobank.model.base.SaxobankModel2` follow the policy active in current context,
+`UserSession` and `Streaming` activate their own policy while building models from Saxobank data,
+raw snapshots of subscriptions keep the policy of their session to build models when they're read.
+
+Usage:
+    policy = ValidationPolicy(ValidationLevel.Sampled, sample_every=1000, on_failure=report)
+    app = Application(SIM, key, secret, validation_policy=policy)
+"""
+from __future__ import annotations
+
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ValidationLevel(str, Enum):
+    """How much inbound data is type checked.
+
+    Attributes:
+        Strict: Validate every model, raise on failure.
+        Sampled: Validate the first model of each type and one in `sample_every` of them afterwards,
+            report failures to the hook instead of raising.
+        Off: Build models without validation, for trusted data.
+    """
+
+    Strict = "strict"
+    Sampled = "sampled"
+    Off = "off"
+
+
+def _log_failure(model: object, error: ValueError) -> None:
+    logger.warning("Validation of %s failed: %s", type(model).__name__, error)
+
+
+@dataclass
+class ValidationPolicy:
+    """Validation level along with its sampling state.
+
+    Attributes:
+        level: Validation level.
+        sample_every: Interval of validated models per type in sampled level.
+        on_failure: Called with invalid model and error in sampled level, logs a warning by default.
+    """
+
+    level: ValidationLevel = ValidationLevel.Strict
+    sample_every: int = 100
+    on_failure: Callable[[object, ValueError], None] = _log_failure
+    _counts: Dict[type, int] = field(default_factory=dict, init=False, repr=False)
+
+    def should_validate(self, cls: type) -> bool:
+        if self.level is ValidationLevel.Strict:
+            return True
+        if self.level is ValidationLevel.Off:
+            return False
+
+        count = self._counts.get(cls, 0)
+        self._counts[cls] = count + 1
+        return count % self.sample_every == 0
+
+    def fail(self, model: object, error: ValueError) -> None:
+        """Raise error in strict level, report it to the hook otherwise."""
+        if self.level is ValidationLevel.Strict:
+            raise error
+        self.on_failure(model, error)
+
+
+STRICT_VALIDATION = ValidationPolicy()
+
+_current: ContextVar[ValidationPolicy] = ContextVar("validation_policy", default=STRICT_VALIDATION)
+
+
+def current_validation_policy() -> ValidationPolicy:
+    return _current.get()
+
+
+@contextmanager
+def use_validation_policy(policy: Optional[ValidationPolicy]) -> Iterator[None]:
+    """Activate policy in current context, None keeps the active one."""
+    if policy is None:
+        yield
+        return
+
+    token = _current.set(policy)
+    try:
+        yield
+    finally:
+        _current.reset(token)
@@ -0,0 +1,75 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from saxobank.model.chart import charts
+from saxobank.model.resp.chart import GetChartChartsResp
+
+np = pytest.importorskip("numpy")
+
+samples = [
+    {"CloseAsk": 1.1, "CloseBid": 1.0, "Time": "2023-09-14T08:31:00.000Z"},
+    {"CloseAsk": 1.2, "CloseBid": 1.1, "Time": "2023-09-14T08:32:00.000Z"},
+]
+
+
+def test_ChartSamples_from_json() -> None:
+    columnar = charts.ChartSamples.from_json(samples)
+
+    assert len(columnar) == 2
+    assert columnar.columns == ("Time", "CloseAsk", "CloseBid")
+    assert columnar.to_numpy("CloseAsk").tolist() == [1.1, 1.2]
+    assert columnar.to_numpy("Time")[1] == np.datetime64("2023-09-14T08:32:00.000")
+    time = datetime(2023, 9, 14, 8, 31, tzinfo=timezone.utc)
+    first = charts.ChartSample(CloseAsk=1.1, CloseBid=1.0, Time=time)
+    assert columnar[0] == first
+    assert [s.CloseBid for s in columnar[1:]] == [1.1]
+
+
+def test_ChartSamples_from_json_null_values() -> None:
+    columnar = charts.ChartSamples.from_json(
+        [samples[0], {"CloseAsk": None, "Time": "2023-09-14T08:32:00.000Z"}]
+    )
+
+    assert columnar.to_numpy("CloseAsk")[0] == 1.1
+    assert np.isnan(columnar.to_numpy("CloseAsk")[1])
+    assert np.isnan(columnar.to_numpy("CloseBid")[1])
+
+
+def test_ChartSamples_to_numpy_is_readonly_view() -> None:
+    columnar = charts.ChartSamples.from_json(samples)
+    view = columnar.to_numpy("CloseBid")
+
+    assert np.shares_memory(view, columnar[:1].to_numpy("CloseBid"))
+    with pytest.raises(ValueError):
+        view[0] = 0.0
+
+
+def test_GetChartChartsResp_from_json_columnar() -> None:
+    resp = GetChartChartsResp.from_json_columnar(
+        {"ChartInfo": {"ExchangeId": "NYSE", "Horizon": 1}, "Data": samples, "DataVersion": 1}
+    )
+
+    assert isinstance(resp.Data, charts.ChartSamples)
+    assert resp.Data.to_numpy("CloseBid").tolist() == [1.0, 1.1]
+
+
+def test_ChartSamples_rows_of_other_instruments() -> None:
+    columnar = charts.ChartSamples.from_json(
+        [
+            {
+                "Open": 10.0,
+                "High": 11.0,
+                "Low": 9.5,
+                "Close": 10.5,
+                "Time": "2023-09-14T08:31:00.000Z",
+            }
+        ]
+    )
+
+    assert columnar.columns == ("Time", "Open", "High", "Low", "Close")
+    assert columnar.to_numpy("Close").tolist() == [10.5]
+    with pytest.raises(ValueError, match="CloseAsk"):
+        columnar[0]
+    with pytest.raises(ValueError, match="CloseAsk"):
+        list(columnar)
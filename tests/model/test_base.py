@@ -0,0 +1,195 @@
+import copy
+import pickle
+from dataclasses import FrozenInstanceError, dataclass
+from datetime import datetime, timezone
+from typing import Any, ClassVar, Literal, Optional, Union
+
+import pytest
+
+from saxobank.model.base import (
+    ReadOnlyList,
+    SaxobankListItemModel,
+    SaxobankModel,
+    SaxobankModel2,
+    format_timestamp,
+    parse_timestamp,
+    parse_timestamps,
+)
+
+
+class Quote(SaxobankModel):
+    Ask: Optional[float] = None
+    Bid: Optional[float] = None
+
+
+class Price(SaxobankModel):
+    Uic: int
+    Quote: Quote
+    Tags: list[str] = []
+
+
+def test_SaxobankModel_merge_shares_unchanged() -> None:
+    snapshot = Price(Uic=21, Quote=Quote(Ask=1.0, Bid=0.9), Tags=["a"])
+    merged = snapshot.merge(Price.model_construct(Quote=Quote(Bid=0.95)))
+
+    assert merged.Quote == Quote(Ask=1.0, Bid=0.95)
+    assert merged.Tags is snapshot.Tags
+    assert snapshot.Quote == Quote(Ask=1.0, Bid=0.9)
+    assert snapshot.merge(Price.model_construct()) is snapshot
+
+
+def test_SaxobankModel_lists_are_readonly() -> None:
+    snapshot = Price(Uic=21, Quote=Quote(), Tags=["a"])
+
+    assert isinstance(snapshot.Tags, ReadOnlyList)
+    with pytest.raises(TypeError):
+        snapshot.Tags.append("b")
+    assert snapshot.model_dump()["Tags"] == ["a"]
+
+
+def test_ReadOnlyList() -> None:
+    rows = ReadOnlyList([1, 2])
+
+    for modify in (lambda: rows.append(3), lambda: rows.sort(), lambda: rows.__setitem__(0, 3)):
+        with pytest.raises(TypeError):
+            modify()
+    with pytest.raises(TypeError):
+        rows += [3]
+    assert rows == [1, 2]
+    assert copy.deepcopy(rows) == pickle.loads(pickle.dumps(rows)) == [1, 2]
+    assert list(rows) + [3] == [1, 2, 3]
+
+
+@dataclass
+class Info(SaxobankModel2):
+    Horizon: int
+    DelayedByMinutes: Optional[int] = None
+
+
+@dataclass
+class Chart(SaxobankModel2):
+    DataVersion: int
+    Info: Info
+    Samples: Optional[list[int]] = None
+
+
+def test_SaxobankModel2_merge_shares_unchanged() -> None:
+    snapshot = Chart(DataVersion=1, Info=Info(Horizon=1), Samples=[1, 2])
+    merged = snapshot.merge({"DataVersion": 2, "Info": {"DelayedByMinutes": 15}})
+
+    assert merged == Chart(DataVersion=2, Info=Info(Horizon=1, DelayedByMinutes=15), Samples=[1, 2])
+    assert merged.Samples is snapshot.Samples
+    assert snapshot == Chart(DataVersion=1, Info=Info(Horizon=1), Samples=[1, 2])
+    assert snapshot.merge({"Info": {"Horizon": 1}}) is snapshot
+
+
+@dataclass(frozen=True)
+class Sample(SaxobankModel2):
+    _list_key: ClassVar[Optional[str]] = "Time"
+
+    Time: int
+    Value: float
+
+
+@dataclass(frozen=True)
+class Series(SaxobankModel2):
+    Version: int
+    Data: list[Sample]
+
+
+def test_SaxobankModel2_merge_rows() -> None:
+    snapshot = Series(Version=1, Data=[Sample(Time=1, Value=1.0), Sample(Time=2, Value=2.0)])
+    merged = snapshot.merge({"Data": [{"Time": 2, "Value": 2.5}, {"Time": 3, "Value": 3.0}]})
+
+    assert merged.Data == [
+        Sample(Time=1, Value=1.0),
+        Sample(Time=2, Value=2.5),
+        Sample(Time=3, Value=3.0),
+    ]
+    assert merged.Data[0] is snapshot.Data[0]
+    assert snapshot.Data == [Sample(Time=1, Value=1.0), Sample(Time=2, Value=2.0)]
+
+    with pytest.raises(ValueError):
+        snapshot.merge({"Data": [{"Time": 4, "Value": "x"}]})
+    with pytest.raises(ValueError):
+        snapshot.merge({"Version": "2"})
+    with pytest.raises(FrozenInstanceError):
+        merged.Version = 2
+    # Merged rows are shared with the following snapshots, so they are read-only as well.
+    with pytest.raises(TypeError):
+        merged.Data.append(Sample(Time=4, Value=4.0))
+
+
+class Row(SaxobankListItemModel):
+    _list_key: ClassVar[str] = "RowId"
+
+    RowId: str
+    Amount: Optional[int] = None
+
+
+class Rows(SaxobankModel):
+    Data: list[Row]
+
+
+def test_SaxobankModel_merge_keyed_rows() -> None:
+    snapshot = Rows(Data=[Row(RowId="a", Amount=1), Row(RowId="b", Amount=2)])
+
+    first = snapshot.merge(Rows(Data=[Row(RowId="b", Amount=3), Row(RowId="c", Amount=4)]))
+    assert [(r.RowId, r.Amount) for r in first.Data] == [("a", 1), ("b", 3), ("c", 4)]
+    assert first.Data[0] is snapshot.Data[0]
+    assert [r.Amount for r in snapshot.Data] == [1, 2]
+
+    deleted = Row.model_validate({"RowId": "a", "__meta_deleted": True})
+    second = first.merge(Rows(Data=[deleted, Row(RowId="c", Amount=5)]))
+    assert [(r.RowId, r.Amount) for r in second.Data] == [("b", 3), ("c", 5)]
+
+    third = second.merge(Rows(Data=[Row(RowId="b", Amount=6)]))
+    assert [(r.RowId, r.Amount) for r in third.Data] == [("b", 6), ("c", 5)]
+
+
+@dataclass
+class Typed(SaxobankModel2):
+    Price: float
+    Kind: Literal["Ask", "Bid"]
+    Values: list[int]
+    Extra: Optional[Union[Info, dict[str, Any]]] = None
+
+
+def test_SaxobankModel2_validates_compiled() -> None:
+    Typed(Price=1, Kind="Ask", Values=[1, 2], Extra={"Horizon": 1})
+    Typed(Price=1.0, Kind="Bid", Values=[], Extra=Info(Horizon=1))
+
+    for invalid in ({"Price": "1"}, {"Kind": "Mid"}, {"Values": [1, "2"]}, {"Extra": {1: 2}}):
+        with pytest.raises(ValueError):
+            Typed(**{"Price": 1.0, "Kind": "Ask", "Values": [1], **invalid})
+
+
+def test_parse_timestamp() -> None:
+    expected = datetime(2023, 9, 14, 8, 31, 4, 123000, tzinfo=timezone.utc)
+
+    assert parse_timestamp("2023-09-14T08:31:04.123Z") == expected
+    assert parse_timestamp("2023-09-14T08:31:04.123") == expected
+    assert parse_timestamp("2023-09-14T08:31:04Z") == expected.replace(microsecond=0)
+
+
+def test_format_timestamp() -> None:
+    assert (
+        format_timestamp(parse_timestamp("2023-09-14T08:31:04.123Z")) == "2023-09-14T08:31:04.123Z"
+    )
+    assert format_timestamp(datetime(2023, 9, 14, 8, 31)) == "2023-09-14T08:31:00.000Z"
+
+
+@pytest.mark.parametrize(
+    "timestamps",
+    [
+        ["2023-09-14T08:31:04.123Z", "2023-09-14T08:31:05.000Z"],
+        ["2023-09-14T08:31:04.123Z", "2023-09-14T08:31:05Z"],
+        ["2023-09-14T08:31:04.123", "2023-09-14T08:31:05.000"],
+    ],
+)
+def test_parse_timestamps(timestamps: list[str]) -> None:
+    np = pytest.importorskip("numpy")
+
+    parsed = parse_timestamps(timestamps)
+    assert parsed.dtype == np.dtype("datetime64[ms]")
+    assert parsed.tolist() == [parse_timestamp(t).replace(tzinfo=None) for t in timestamps]
@@ -14,3 +14,8 @@ def test_Heartbeats_serialize() -> None:
 
 def test_Heartbeats_deserialize() -> None:
     assert from_response(exp_Heartbeats, streaming.Heartbeats) == mdl_Heartbeats
+
+
+def test_Heartbeats_slotted() -> None:
+    assert not hasattr(mdl_Heartbeats, "__dict__")
+    assert streaming.Heartbeats("IP44964", "NoNewData") == mdl_Heartbeats
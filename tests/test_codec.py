@@ -0,0 +1,92 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+
+from saxobank import codec
+
+DOCUMENT = b'{"Data": [{"CloseAsk": 1.5, "Time": "2023-09-14T08:31:00.000Z"}], "DataVersion": 1}'
+EXPECTED = {"Data": [{"CloseAsk": 1.5, "Time": "2023-09-14T08:31:00.000Z"}], "DataVersion": 1}
+
+
+@pytest.mark.parametrize(
+    "factory", [lambda: codec.STDLIB_CODEC, codec.orjson_codec, codec.msgspec_codec]
+)
+def test_loads(factory) -> None:
+    try:
+        json_codec = factory()
+    except ImportError:
+        pytest.skip("codec is not installed")
+
+    assert json_codec.loads(DOCUMENT) == EXPECTED
+    assert json_codec.loads(memoryview(DOCUMENT)) == EXPECTED
+    assert json_codec.loads(DOCUMENT.decode()) == EXPECTED
+
+
+def test_dumps_decimal() -> None:
+    assert codec.default_codec().dumps({"Amount": Decimal("0.1")}) == '{"Amount": 0.1}'
+
+
+def quote_message_class() -> type:
+    descriptor_pb2 = pytest.importorskip("google.protobuf.descriptor_pb2")
+    from google.protobuf import descriptor_pool, message_factory, timestamp_pb2
+
+    Field = descriptor_pb2.FieldDescriptorProto
+    proto = descriptor_pb2.FileDescriptorProto(
+        name="price.proto", package="fixture", dependency=["google/protobuf/timestamp.proto"]
+    )
+    quote = proto.message_type.add(name="Quote")
+    quote.field.add(name="Ask", number=1, type=Field.TYPE_DOUBLE, label=Field.LABEL_OPTIONAL)
+    quote.field.add(name="Bid", number=2, type=Field.TYPE_DOUBLE, label=Field.LABEL_OPTIONAL)
+    price = proto.message_type.add(name="Price")
+    price.field.add(name="Uic", number=1, type=Field.TYPE_INT64, label=Field.LABEL_OPTIONAL)
+    price.field.add(
+        name="Quote",
+        number=2,
+        type=Field.TYPE_MESSAGE,
+        type_name=".fixture.Quote",
+        label=Field.LABEL_OPTIONAL,
+    )
+    price.field.add(
+        name="LastUpdated",
+        number=3,
+        type=Field.TYPE_MESSAGE,
+        type_name=".google.protobuf.Timestamp",
+        label=Field.LABEL_OPTIONAL,
+    )
+    price.field.add(name="Tags", number=4, type=Field.TYPE_STRING, label=Field.LABEL_REPEATED)
+
+    pool = descriptor_pool.DescriptorPool()
+    pool.AddSerializedFile(timestamp_pb2.DESCRIPTOR.serialized_pb)
+    pool.Add(proto)
+    return message_factory.GetMessageClass(pool.FindMessageTypeByName("fixture.Price"))
+
+
+def test_protobuf_decoder() -> None:
+    Price = quote_message_class()
+    message = Price(Uic=2**40, Tags=["a", "b"])
+    message.Quote.Ask = 1.5
+    message.LastUpdated.FromDatetime(datetime(2023, 9, 14, 8, 31, 4, tzinfo=timezone.utc))
+
+    decoded = codec.protobuf_decoder(Price)(memoryview(message.SerializeToString()))
+
+    assert decoded == {
+        "Uic": 2**40,
+        "Quote": {"Ask": 1.5},
+        "LastUpdated": datetime(2023, 9, 14, 8, 31, 4, tzinfo=timezone.utc),
+        "Tags": ["a", "b"],
+    }
+
+
+class LabeledField:
+    # Field descriptor of older protobuf releases, without is_repeated.
+    LABEL_OPTIONAL = 1
+    LABEL_REPEATED = 3
+
+    def __init__(self, label: int) -> None:
+        self.label = label
+
+
+def test_is_repeated_by_label() -> None:
+    assert codec._is_repeated(LabeledField(LabeledField.LABEL_REPEATED))
+    assert not codec._is_repeated(LabeledField(LabeledField.LABEL_OPTIONAL))
@@ -0,0 +1,750 @@
+import asyncio
+import struct
+from json import dumps
+from typing import Any
+
+import aiohttp
+import pytest
+
+from saxobank import exception
+from saxobank.codec import STDLIB_CODEC, JsonCodec
+from saxobank.model.chart.charts import ChartSample, ChartSubscriptionRequest, GetResp
+from saxobank.model.common import ResponseCode
+from saxobank.model.port.positions import MeRes, PositionsRes
+from saxobank.streaming_session import (
+    DataMessage,
+    DistributionQueue,
+    Distributor,
+    FrameBuffer,
+    OverflowPolicy,
+    PayloadFormat,
+    Streaming,
+    StreamingSession,
+    SubscriptionMultiplexer,
+    SubscriptionRequest,
+    _CreateSubscriptionResponse,
+    _list_row_model,
+    _normalize_arguments,
+)
+from saxobank.subscription import Subscription, Subscriptions
+from saxobank.user_session import RateLimiter, UserSession
+from saxobank.validation import STRICT_VALIDATION, ValidationLevel, ValidationPolicy
+
+
+def data_message(
+    message_id: int, reference_id: str, payload: object, payload_format: int = 0
+) -> bytes:
+    ref_id = reference_id.encode("ascii")
+    body = dumps(payload).encode("utf-8")
+    return (
+        struct.pack("<Q2xB", message_id, len(ref_id))
+        + ref_id
+        + struct.pack("<BI", payload_format, len(body))
+        + body
+    )
+
+
+def test_DataMessage_header() -> None:
+    message = DataMessage(data_message(2**40 + 7, "IP44964", [{"Uic": 21}]))
+
+    assert message.message_id == 2**40 + 7
+    assert message.reference_id == "IP44964"
+    assert message._payload_fmt == 0
+    assert message._payload_size == len(b'[{"Uic": 21}]')
+    assert message.payload == [{"Uic": 21}]
+
+
+def test_DataMessage_payload_is_view() -> None:
+    frame = data_message(1, "_heartbeat", {"a": 1})
+    message = DataMessage(frame)
+
+    assert isinstance(message.raw_payload, memoryview)
+    assert message.raw_payload.obj is frame
+    assert bytes(message.raw_payload) == b'{"a": 1}'
+
+
+def test_DataMessage_protobuf_payload() -> None:
+    assert DataMessage(data_message(1, "ref", {}, payload_format=1)).payload is None
+
+
+def test_DataMessage_split() -> None:
+    frame = data_message(1, "ref1", {"n": 1}) + data_message(2, "ref22", {"n": 2})
+    messages = list(DataMessage.split(frame))
+
+    assert [(m.message_id, m.reference_id, m.payload) for m in messages] == [
+        (1, "ref1", {"n": 1}),
+        (2, "ref22", {"n": 2}),
+    ]
+    assert all(m.raw_payload.obj is frame for m in messages)
+
+
+@pytest.mark.parametrize("cut", [4, 20])
+def test_DataMessage_split_truncated(cut: int) -> None:
+    frame = data_message(1, "ref1", {"n": 1}) + data_message(2, "ref2", {"n": 2})[:cut]
+    messages = DataMessage.split(frame)
+
+    assert next(messages).payload == {"n": 1}
+    with pytest.raises(exception.TruncatedDataMessageError, match="offset 28"):
+        next(messages)
+
+
+@pytest.mark.asyncio
+async def test_Streaming_receive_truncated_frame() -> None:
+    frames = [
+        data_message(1, "ref1", {"n": 1}) + data_message(2, "ref1", {"n": 2})[:-1],
+        data_message(3, "ref1", {"n": 3}),
+    ]
+    streaming = Streaming(FakeWebSocket(frames), subscriptions("ref1"))
+
+    assert isinstance(await streaming.receive(), exception.TruncatedDataMessageError)
+    assert (await streaming.receive()).state == {"n": 1}
+    assert (await streaming.receive()).state == {"n": 3}
+
+
+class FakeWebSocket:
+    def __init__(self, frames: list[bytes], close_after: bool = False, idle: bool = False) -> None:
+        self._reader = list(frames)
+        self._close_after = close_after or idle
+        self._idle = idle
+        self.closed = False
+
+    async def receive(self) -> aiohttp.WSMessage:
+        if not self._reader and self._idle:
+            await asyncio.Event().wait()
+        if not self._reader:
+            self.closed = True
+            return aiohttp.WSMessage(aiohttp.WSMsgType.CLOSED, None, None)
+
+        frame = self._reader.pop(0)
+        self.closed = not self._reader and not self._close_after
+        return aiohttp.WSMessage(aiohttp.WSMsgType.BINARY, frame, None)
+
+    async def close(self) -> bool:
+        self.closed = True
+        return True
+
+
+class FakeSnapshot:
+    def __init__(self, state: Any = None) -> None:
+        self.state = state
+
+    def copy(self) -> "FakeSnapshot":
+        return FakeSnapshot(self.state)
+
+    def apply_delta(self, delta: Any) -> tuple["FakeSnapshot", bool]:
+        return FakeSnapshot(delta), False
+
+
+def subscriptions(
+    *reference_ids: str, tag: str | None = None, conflate: bool = False, track_changes: bool = False
+) -> Subscriptions:
+    subscriptions = Subscriptions()
+    for reference_id in reference_ids:
+        subscription = Subscription(
+            reference_id, tag, conflate=conflate, track_changes=track_changes
+        )
+        subscription._setup(60, FakeSnapshot())
+        subscriptions.add(subscription)
+    return subscriptions
+
+
+@pytest.mark.asyncio
+async def test_Streaming_receive_drains_frame() -> None:
+    ws = FakeWebSocket([data_message(1, "ref1", {"n": 1}) + data_message(2, "ref2", {"n": 2})])
+    streaming = Streaming(ws, subscriptions("ref1", "ref2"))
+
+    assert (await streaming.receive()).state == {"n": 1}
+    assert (await streaming.receive()).state == {"n": 2}
+
+
+@pytest.mark.asyncio
+async def test_Streaming_receive_skips_untracked() -> None:
+    decoded = []
+
+    def loads(b: memoryview) -> Any:
+        decoded.append(bytes(b))
+        return STDLIB_CODEC.loads(b)
+
+    frame = data_message(1, "gone", {"n": 1}) + data_message(2, "ref1", {"n": 2})
+    streaming = Streaming(
+        FakeWebSocket([frame]), subscriptions("ref1"), codec=JsonCodec("recording", loads)
+    )
+
+    assert (await streaming.receive()).state == {"n": 2}
+    assert decoded == [b'{"n": 2}']
+    assert streaming.untracked_messages == 1
+
+
+@pytest.mark.asyncio
+async def test_Streaming_receive_protobuf() -> None:
+    def decoder(b: memoryview) -> Any:
+        return {"decoded": bytes(b)}
+
+    subscription = Subscription("ref1", payload_decoders={PayloadFormat.Protobuf: decoder})
+    subscription._setup(60, FakeSnapshot())
+    streams = Subscriptions()
+    streams.add(subscription)
+
+    frame = data_message(1, "ref1", "x", PayloadFormat.Protobuf) + data_message(2, "ref1", "y", 7)
+    streaming = Streaming(FakeWebSocket([frame]), streams)
+
+    assert (await streaming.receive()).state == {"decoded": b'"x"'}
+    error = await streaming.receive()
+    assert isinstance(error, exception.UnsupportedPayloadFormatError)
+    assert error.payload_format == 7
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "overflow, expected, dropped",
+    [
+        (OverflowPolicy.DropOldest, ["b2", "a3"], 1),
+        (OverflowPolicy.Conflate, ["a3", "b2"], 1),
+    ],
+)
+async def test_DistributionQueue_overflow(
+    overflow: OverflowPolicy, expected: list[str], dropped: int
+) -> None:
+    queue = DistributionQueue(2, overflow)
+    for item, reference_id in (("a1", "a"), ("b2", "b"), ("a3", "a")):
+        await queue.put(item, reference_id)
+    await queue.close()
+
+    assert [item async for item in queue] == expected
+    assert queue.dropped == dropped
+
+
+@pytest.mark.asyncio
+async def test_Distributor_routes() -> None:
+    frame = b"".join(
+        data_message(i, ref, {"n": i}) for i, ref in enumerate(["ref1", "ref2", "ref1"])
+    )
+    streaming = Streaming(FakeWebSocket([frame]), subscriptions("ref1", "ref2", tag="prices"))
+    distributor = Distributor(streaming)
+    ref1 = distributor.stream(reference_id="ref1")
+    prices = distributor.stream(tag="prices", overflow=OverflowPolicy.Conflate)
+
+    await distributor.distribute()
+
+    assert [u.snapshot.state async for u in ref1] == [{"n": 0}, {"n": 2}]
+    assert [u.snapshot.state async for u in prices] == [{"n": 2}, {"n": 1}]
+
+
+@pytest.mark.asyncio
+async def test_Streaming_receive_conflates() -> None:
+    frames = [
+        b"".join(
+            data_message(i, ref, {"n": i}) for i, ref in enumerate(["ref1", "ref2", "ref1", "ref1"])
+        ),
+        data_message(4, "ref1", {"n": 4}),
+    ]
+    streaming = Streaming(
+        FakeWebSocket(frames), subscriptions("ref1", "ref2", conflate=True, track_changes=True)
+    )
+
+    updates = [await streaming.receive_update() for _ in range(2)]
+
+    # Both frames are already buffered by reader when the first one is decoded.
+    assert [(u.reference_id, u.snapshot.state, u.coalesced) for u in updates] == [
+        ("ref2", {"n": 1}, 0),
+        ("ref1", {"n": 4}, 3),
+    ]
+    assert updates[1].changes.paths == {("n",)}
+
+
+@pytest.mark.asyncio
+async def test_Streaming_receive_invalid_partition() -> None:
+    frame = data_message(1, "ref1", {"PartitionNumber": 3, "TotalPartition": 3}) + data_message(
+        2, "ref1", {"n": 2}
+    )
+    streaming = Streaming(
+        FakeWebSocket([frame]), subscriptions("ref1"), raise_if_stream_error=False
+    )
+
+    error = await streaming.receive()
+    assert isinstance(error, exception.InvalidPartitionError)
+    assert (error.reference_id, error.partition_number) == ("ref1", 3)
+    assert (await streaming.receive()).state == {"n": 2}
+
+
+def position(position_id: str, net_position_id: str) -> dict:
+    return {
+        "NetPositionId": net_position_id,
+        "PositionId": position_id,
+        "PositionBase": None,
+        "PositionView": None,
+    }
+
+
+@pytest.mark.asyncio
+async def test_Streaming_receive_list_snapshot() -> None:
+    subscription = Subscription("ref1")
+    subscription._setup(
+        60, [PositionsRes(**position("a", "n1")), PositionsRes(**position("b", "n2"))]
+    )
+    empty = Subscription("ref2")
+    empty._setup(60, [], _list_row_model(MeRes))
+    streams = Subscriptions()
+    streams.add(subscription)
+    streams.add(empty)
+
+    frame = data_message(
+        1,
+        "ref1",
+        [{"PositionId": "a", "NetPositionId": "n3"}, {"PositionId": "b", "__meta_deleted": True}],
+    ) + data_message(2, "ref2", [position("c", "n4")])
+    streaming = Streaming(FakeWebSocket([frame]), streams)
+
+    # Rows of deltas are partial, merged by PositionId of PositionsRes.
+    first = await streaming.receive()
+    assert first.model == [PositionsRes(**position("a", "n3"))]
+    second = await streaming.receive()
+    assert second.model == [PositionsRes(**position("c", "n4"))]
+
+
+@pytest.mark.asyncio
+async def test_Streaming_receive_validation_policy() -> None:
+    subscription = Subscription("ref1")
+    subscription._setup(60, GetResp(Data=[], DataVersion=1))
+    streams = Subscriptions()
+    streams.add(subscription)
+    failures: list[ValueError] = []
+    policy = ValidationPolicy(
+        ValidationLevel.Sampled, sample_every=1, on_failure=lambda m, e: failures.append(e)
+    )
+
+    streaming = Streaming(
+        FakeWebSocket([data_message(1, "ref1", {"DataVersion": "2"})]),
+        streams,
+        validation_policy=policy,
+    )
+
+    # Merged snapshot is validated under the policy of streaming, which reports instead of raising.
+    assert (await streaming.receive()).DataVersion == "2"
+    assert len(failures) == 1
+
+
+class FakeWsClient:
+    def __init__(self, *websockets: FakeWebSocket) -> None:
+        self._websockets = list(websockets)
+        self.params: list[dict[str, Any]] = []
+        self.headers: list[dict[str, str]] = []
+
+    async def ws_connect(
+        self, url: str, params: dict[str, Any], headers: dict[str, str]
+    ) -> FakeWebSocket:
+        self.params.append(params)
+        self.headers.append(headers)
+        return self._websockets.pop(0)
+
+
+class FakeUserSession:
+    codec = STDLIB_CODEC
+    validation_policy = STRICT_VALIDATION
+
+    def is_odata_response(self, response_model: Any) -> Any:
+        return False, None
+
+
+class FakeSubscriptionResponse:
+    def __init__(self, code: ResponseCode, state: Any = None) -> None:
+        self.code = code
+        self.model = type("Model", (), {"Snapshot": FakeSnapshot(state), "InactivityTimeout": 60})()
+
+
+@pytest.mark.asyncio
+async def test_StreamingSession_supervise_resumes() -> None:
+    ws_client = FakeWsClient(
+        FakeWebSocket(
+            [data_message(7, "ref1", {"n": 7}) + data_message(8, "ref1", {"n": 8})],
+            close_after=True,
+        ),
+        FakeWebSocket([data_message(9, "ref1", {"n": 9})]),
+    )
+    session = StreamingSession("wss://localhost/", FakeUserSession(), ws_client, "token")
+    session._subscriptions = subscriptions("ref1")
+
+    updates = []
+    async for update in session.supervise(initial_backoff=0):
+        updates.append(update)
+        if len(updates) == 4:
+            break
+
+    assert [u.snapshot.state for u in updates if not isinstance(u, Exception)] == [
+        {"n": 7},
+        {"n": 8},
+        {"n": 9},
+    ]
+    assert isinstance(updates[2], exception.StreamingConnectionLostError)
+    assert "messageid" not in ws_client.params[0]
+    assert ws_client.params[1]["messageid"] == 8
+
+
+@pytest.mark.asyncio
+async def test_StreamingSession_supervise_recreates_reset() -> None:
+    reset = {"ReferenceId": "_resetsubscriptions", "TargetReferenceIds": ["ref1", "ref2"]}
+    ws_client = FakeWsClient(
+        FakeWebSocket([data_message(7, "_resetsubscriptions", reset)], close_after=True),
+        FakeWebSocket([]),
+        FakeWebSocket([data_message(8, "ref2", {"n": 8})], idle=True),
+    )
+    session = StreamingSession("wss://localhost/", FakeUserSession(), ws_client, "token")
+    posts, requests = [], []
+
+    async def post(reference_id: str) -> FakeSubscriptionResponse:
+        posts.append(reference_id)
+        requests.append(("POST", reference_id))
+        # The first re-creation of ref2 fails.
+        if reference_id == "ref2" and posts.count(reference_id) == 2:
+            raise RuntimeError(reference_id)
+        return FakeSubscriptionResponse(ResponseCode.CREATED, reference_id)
+
+    async def delete(reference_id: str) -> None:
+        requests.append(("DELETE", reference_id))
+
+    await session.create_subscription_requests(
+        [
+            SubscriptionRequest(lambda r=r: post(r), r, delete_job=lambda r=r: delete(r))
+            for r in ("ref1", "ref2")
+        ]
+    )
+
+    updates = []
+    async for update in session.supervise(initial_backoff=0):
+        updates.append(update)
+        if len(updates) == 5:
+            break
+
+    assert [type(u) for u in updates[:4]] == [
+        exception.ResetSubscriptionsError,
+        exception.SubscriptionRecreationError,
+        exception.StreamingConnectionLostError,
+        exception.StreamingConnectionLostError,
+    ]
+    assert updates[1].reference_ids == {"ref2"}
+    # The failed one is retried on reconnection.
+    assert sorted(posts) == ["ref1", "ref1", "ref2", "ref2", "ref2"]
+    # Reset subscription is deleted before being created again.
+    assert [method for method, r in requests if r == "ref1"] == ["POST", "DELETE", "POST"]
+    assert [method for method, r in requests if r == "ref2"] == [
+        "POST",
+        "DELETE",
+        "POST",
+        "DELETE",
+        "POST",
+    ]
+    assert (updates[4].reference_id, updates[4].snapshot.state) == ("ref2", {"n": 8})
+    # The second connection was lost before any message, the third one resumes still from message 7.
+    assert [p.get("messageid") for p in ws_client.params] == [None, 7, 7]
+
+
+@pytest.mark.asyncio
+async def test_StreamingSession_supervise_reauthorizes_disconnect() -> None:
+    disconnect = {"ReferenceId": "_disconnect"}
+    ws_client = FakeWsClient(
+        FakeWebSocket([data_message(7, "_disconnect", disconnect)], close_after=True),
+        FakeWebSocket([data_message(1, "ref1", {"n": 1})], idle=True),
+    )
+    session = StreamingSession("wss://localhost/", FakeUserSession(), ws_client, "token")
+    posts = []
+
+    async def post(reference_id: str) -> FakeSubscriptionResponse:
+        posts.append(reference_id)
+        return FakeSubscriptionResponse(ResponseCode.CREATED, reference_id)
+
+    async def refresh_token() -> str:
+        return "token2"
+
+    await session.create_subscription_requests([SubscriptionRequest(lambda: post("ref1"), "ref1")])
+
+    updates = []
+    async for update in session.supervise(initial_backoff=0, refresh_token=refresh_token):
+        updates.append(update)
+        if len(updates) == 2:
+            break
+
+    assert isinstance(updates[0], exception.StreamingDisconnectError)
+    assert (updates[1].reference_id, updates[1].snapshot.state) == ("ref1", {"n": 1})
+    # New connection is authorized by the new token and starts over, with subscriptions re-created.
+    assert ws_client.headers[1]["Authorization"] == "Bearer token2"
+    assert [p.get("messageid") for p in ws_client.params] == [None, None]
+    assert posts == ["ref1", "ref1"]
+
+
+@pytest.mark.asyncio
+async def test_StreamingSession_supervise_ends_on_disconnect() -> None:
+    ws_client = FakeWsClient(FakeWebSocket([data_message(7, "_disconnect", {})], close_after=True))
+    session = StreamingSession("wss://localhost/", FakeUserSession(), ws_client, "token")
+
+    updates = [update async for update in session.supervise(initial_backoff=0)]
+
+    assert [type(u) for u in updates] == [exception.StreamingDisconnectError]
+
+
+@pytest.mark.asyncio
+async def test_FrameBuffer_limit() -> None:
+    buffer = FrameBuffer(max_bytes=4)
+    await buffer.put(b"abc")
+    writer = asyncio.ensure_future(buffer.put(b"de"))
+    await asyncio.sleep(0)
+
+    assert not writer.done() and buffer.stalls == 1
+    assert await buffer.get() == b"abc"
+    await writer
+    buffer.close()
+
+    assert await buffer.get() == b"de"
+    assert await buffer.get() is None
+    assert buffer.high_water_mark == 3 and buffer.buffered_bytes == 0
+
+
+@pytest.mark.asyncio
+async def test_Streaming_receive_many() -> None:
+    frames = [
+        b"".join(data_message(i, "ref1", {"n": i}) for i in range(3)),
+        data_message(3, "ref2", {"n": 3}),
+    ]
+    streaming = Streaming(FakeWebSocket(frames, idle=True), subscriptions("ref1", "ref2"))
+
+    first = await streaming.receive_many(max_items=2)
+    second = await streaming.receive_many(max_items=10, max_wait=0.01)
+    third = await streaming.receive_many(max_items=10, max_wait=0.01)
+
+    assert [u.snapshot.state["n"] for u in first] == [0, 1]
+    assert [u.snapshot.state["n"] for u in second] == [2, 3]
+    assert third == []
+    await streaming.disconnect()
+
+
+@pytest.mark.asyncio
+async def test_Streaming_receive_defers_unprepared() -> None:
+    streams = subscriptions("ref2")
+    unprepared = Subscription("ref1")
+    streams.add(unprepared)
+    frame = data_message(1, "ref1", {"n": 1}) + data_message(2, "ref2", {"n": 2})
+    streaming = Streaming(FakeWebSocket([frame]), streams)
+
+    assert (await streaming.receive()).state == {"n": 2}
+    assert unprepared._setup(60, FakeSnapshot()).state == {"n": 1}
+
+
+@pytest.mark.asyncio
+async def test_StreamingSession_create_subscription_requests() -> None:
+    session = StreamingSession("wss://localhost/", FakeUserSession(), FakeWsClient(), "token")
+    in_flight = [0]
+    max_in_flight = []
+
+    async def post(reference_id: str) -> FakeSubscriptionResponse:
+        # Every subscription is registered before the first request is sent.
+        if reference_id == "ref1":
+            assert session._subscriptions.reference_ids() == {"ref1", "ref2", "ref3"}
+        in_flight[0] += 1
+        max_in_flight.append(in_flight[0])
+        await asyncio.sleep(0)
+        in_flight[0] -= 1
+        if reference_id == "ref3":
+            raise RuntimeError(reference_id)
+        code = ResponseCode.BAD_REQUEST if reference_id == "ref2" else ResponseCode.CREATED
+        return FakeSubscriptionResponse(code, reference_id)
+
+    requests = [SubscriptionRequest(lambda r=r: post(r), r) for r in ("ref1", "ref2", "ref3")]
+    results = await session.create_subscription_requests(requests, max_concurrent_requests=2)
+
+    assert max(max_in_flight) == 2
+    assert results[0].snapshot.state == "ref1"
+    assert results[1].code == ResponseCode.BAD_REQUEST
+    assert isinstance(results[2], RuntimeError)
+    assert session._subscriptions.reference_ids() == {"ref1"}
+
+
+@pytest.mark.asyncio
+async def test_SubscriptionMultiplexer_shares_subscription() -> None:
+    session = StreamingSession("wss://localhost/", FakeUserSession(), FakeWsClient(), "token")
+    multiplexer = SubscriptionMultiplexer(session)
+    created, deleted = [], []
+
+    async def create() -> Any:
+        created.append(len(created))
+        await asyncio.sleep(0)
+        return _CreateSubscriptionResponse(ResponseCode.CREATED, f"ref{len(created)}")
+
+    async def delete(reference_id: str) -> None:
+        deleted.append(reference_id)
+
+    first, second = await asyncio.gather(
+        multiplexer.subscribe(("charts", 21), create, delete),
+        multiplexer.subscribe(("charts", 21), create, delete),
+    )
+    assert created == [0]
+    assert first.reference_id == second.reference_id == "ref1"
+
+    await first.close()
+    await first.close()
+    assert deleted == []
+
+    async with second:
+        pass
+    assert deleted == ["ref1"]
+    assert len(multiplexer) == 0
+
+    async with await multiplexer.subscribe(("charts", 21), create, delete) as third:
+        assert third.reference_id == "ref2"
+
+
+class FakeHttpResponse:
+    request_info = None
+    content_type = "application/json"
+
+    def __init__(self, status: int, body: Any) -> None:
+        self.status = status
+        self._body = body
+
+    async def __aenter__(self) -> "FakeHttpResponse":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        pass
+
+    async def read(self) -> bytes:
+        return b"" if self._body is None else dumps(self._body).encode("utf-8")
+
+
+class FakeHttp:
+    def __init__(self) -> None:
+        self.requests: list[tuple[str, str, Any]] = []
+
+    def request(self, method: str, url: str, json: Any = None, **kwargs: Any) -> FakeHttpResponse:
+        self.requests.append((method, url, json))
+        if method == "DELETE":
+            return FakeHttpResponse(202, None)
+
+        snapshot = {
+            "Data": [{"CloseAsk": 1.1, "CloseBid": 1.0, "Time": "2023-09-14T08:31:00.000Z"}],
+            "DataVersion": json["Arguments"]["Uic"],
+        }
+        return FakeHttpResponse(
+            201,
+            {
+                "ContextId": json["ContextId"],
+                "ReferenceId": json["ReferenceId"],
+                "State": "Active",
+                "InactivityTimeout": 30,
+                "RefreshRate": 1000,
+                "Format": "application/json",
+                "Snapshot": snapshot,
+            },
+        )
+
+
+def chart_session(http: FakeHttp, *websockets: FakeWebSocket) -> StreamingSession:
+    user_session = UserSession("https://localhost/openapi/", http, RateLimiter(), "token")
+    return StreamingSession("wss://localhost/", user_session, FakeWsClient(*websockets), "token")
+
+
+@pytest.mark.asyncio
+async def test_StreamingSession_chart_charts_subscriptions_post() -> None:
+    http = FakeHttp()
+    session = chart_session(http)
+    arguments = [
+        ChartSubscriptionRequest(AssetType="FxSpot", Uic=uic, Horizon=1) for uic in (21, 22)
+    ]
+
+    results = await session.chart_charts_subscriptions_post(arguments)
+
+    assert [r.code for r in results] == [ResponseCode.CREATED] * 2
+    assert [r.snapshot.DataVersion for r in results] == [21, 22]
+    assert isinstance(results[0].snapshot, GetResp)
+    assert isinstance(results[0].snapshot.Data[0], ChartSample)
+    assert [url for _, url, _ in http.requests] == [
+        "https://localhost/openapi/chart/v1/charts/subscriptions"
+    ] * 2
+    assert http.requests[0][2]["Arguments"]["Uic"] == 21
+    assert {
+        s.reference_id
+        for s in session._subscriptions.with_endpoint("chart/v1/charts/subscriptions")
+    } == {r.reference_id for r in results}
+
+    # Response of DELETE has empty body.
+    deleted = await session.chart_charts_subscription_delete(results[0].reference_id)
+    assert deleted.code == ResponseCode.ACCEPTED
+    method, url, _ = http.requests[-1]
+    assert method == "DELETE"
+    assert (
+        url
+        == f"https://localhost/openapi/chart/v1/charts/subscriptions/{session._context_id}/{results[0].reference_id}"
+    )
+
+
+@pytest.mark.asyncio
+async def test_StreamingSession_chart_charts_subscription_post_recreates_reset() -> None:
+    http = FakeHttp()
+    reset = {"ReferenceId": "_resetsubscriptions", "TargetReferenceIds": ["ref1"]}
+    session = chart_session(
+        http, FakeWebSocket([data_message(1, "_resetsubscriptions", reset)], idle=True)
+    )
+    arguments = ChartSubscriptionRequest(AssetType="FxSpot", Uic=21, Horizon=1)
+    await session.chart_charts_subscription_post(
+        "ref1", replace_reference_id="ref0", arguments=arguments
+    )
+
+    async for update in session.supervise(initial_backoff=0):
+        assert isinstance(update, exception.ResetSubscriptionsError)
+        break
+
+    (_, _, created), (deleted, url, _), (method, _, recreated) = http.requests
+    assert created["ReferenceId"] == "ref1" and created["ReplaceReferenceId"] == "ref0"
+    # Reset subscription is deleted, then created again under the same Reference ID without replacing the old one.
+    assert (deleted, url) == (
+        "DELETE",
+        f"https://localhost/openapi/chart/v1/charts/subscriptions/{session._context_id}/ref1",
+    )
+    assert (
+        method == "POST"
+        and recreated["ReferenceId"] == "ref1"
+        and recreated["ReplaceReferenceId"] is None
+    )
+    assert session._subscriptions.reference_ids() == {"ref1"}
+    assert set(session._recreators) == {"ref1"}
+
+
+def test_normalize_arguments_dataclass() -> None:
+    arguments = ChartSubscriptionRequest(AssetType="FxSpot", Uic=21, Horizon=1)
+
+    assert _normalize_arguments(arguments) == _normalize_arguments(
+        {"Horizon": 1, "Uic": 21, "AssetType": "FxSpot"}
+    )
+    assert _normalize_arguments(arguments) != _normalize_arguments(
+        {"AssetType": "FxSpot", "Uic": 22, "Horizon": 1}
+    )
+
+
+@pytest.mark.asyncio
+async def test_SubscriptionMultiplexer_chart_handles() -> None:
+    http = FakeHttp()
+    ws = FakeWebSocket([])
+    session = chart_session(http, ws)
+    distributor = Distributor(await session.connect())
+    multiplexer = SubscriptionMultiplexer(session, distributor)
+    arguments = ChartSubscriptionRequest(AssetType="FxSpot", Uic=21, Horizon=1)
+
+    first, second = await asyncio.gather(
+        multiplexer.chart_charts_subscription_post(arguments),
+        multiplexer.chart_charts_subscription_post(
+            ChartSubscriptionRequest(AssetType="FxSpot", Uic=21, Horizon=1)
+        ),
+    )
+    assert len(http.requests) == 1
+    assert first.reference_id == second.reference_id
+
+    ws._reader = [data_message(i, first.reference_id, {"DataVersion": 22 + i}) for i in range(2)]
+    await distributor.distribute()
+
+    # Each handle receives every update, instead of sharing them.
+    assert [u.snapshot.DataVersion async for u in first.updates] == [22, 23]
+    assert [u.snapshot.DataVersion async for u in second.updates] == [22, 23]
+
+    await first.close()
+    assert first.reference_id in session._subscriptions.reference_ids()
+    await second.close()
+    assert session._subscriptions.reference_ids() == set()
+    assert [method for method, _, _ in http.requests] == ["POST", "DELETE"]
@@ -0,0 +1,299 @@
+from dataclasses import FrozenInstanceError
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from saxobank.exception import InvalidPartitionError
+from saxobank.model.chart.charts import ChartSample, GetResp
+from saxobank.subscription import Subscription, Subscriptions, merge_raw
+from saxobank.validation import ValidationLevel, ValidationPolicy, use_validation_policy
+
+
+def subscriptions(count: int, timeout: int = 60) -> Subscriptions:
+    subscriptions = Subscriptions()
+    for i in range(count):
+        subscription = Subscription(f"ref{i}")
+        subscription._setup(timeout, None)
+        subscriptions.add(subscription)
+    return subscriptions
+
+
+def test_Subscriptions_remove_timeouts() -> None:
+    target = subscriptions(3)
+    target.extend_timeout(["ref0", "ref1"])
+    now = datetime.now(timezone.utc)
+
+    assert target.remove_timeouts(now) == set()
+    assert target.remove_timeouts(now + timedelta(seconds=61)) == {"ref0", "ref1"}
+    assert target.reference_ids() == {"ref2"}
+
+
+def test_Subscriptions_remove_timeouts_extended() -> None:
+    target = subscriptions(2)
+    target.extend_timeout(["ref0", "ref1"])
+    evaluate_at = datetime.now(timezone.utc) + timedelta(seconds=61)
+
+    # Deadline moves after the evaluated time, entry of the heap gets stale.
+    target.get("ref0")._timeout_after = evaluate_at + timedelta(seconds=1)
+
+    assert target.remove_timeouts(evaluate_at) == {"ref1"}
+    assert target.remove_timeouts(evaluate_at + timedelta(seconds=2)) == {"ref0"}
+    assert len(target) == 0
+
+
+def test_Subscriptions_discard_invalidates_deadline() -> None:
+    target = subscriptions(1)
+    subscription = target.get("ref0")
+    subscription.extend_timeout()
+    target.discard(subscription)
+
+    assert target.remove_timeouts(datetime.now(timezone.utc) + timedelta(seconds=61)) == set()
+
+
+def test_Subscriptions_indexes() -> None:
+    subscriptions = Subscriptions()
+    for reference_id, tag, endpoint in (
+        ("ref1", "a", "charts"),
+        ("ref2", "a", "prices"),
+        ("ref3", None, "charts"),
+    ):
+        subscriptions.add(Subscription(reference_id, tag, endpoint=endpoint))
+
+    assert {s.reference_id for s in subscriptions.with_tag("a")} == {"ref1", "ref2"}
+    assert {s.reference_id for s in subscriptions.with_endpoint("charts")} == {"ref1", "ref3"}
+
+    # Replacing a Reference ID moves it out of the indexes of the previous one.
+    subscriptions.add(Subscription("ref2", "b", endpoint="prices"))
+    assert [s.reference_id for s in subscriptions.with_tag("a")] == ["ref1"]
+
+    subscriptions.remove_items(tag="a")
+    assert subscriptions.reference_ids() == {"ref2", "ref3"}
+
+    subscriptions.remove_items(endpoint="charts")
+    assert subscriptions.reference_ids() == {"ref2"}
+    assert subscriptions.with_endpoint("charts") == []
+
+
+def sample(minute: int, close_ask: float) -> dict:
+    return {
+        "CloseAsk": close_ask,
+        "CloseBid": close_ask - 0.1,
+        "Time": f"2023-09-14T08:{minute:02d}:00.000Z",
+    }
+
+
+def parted(number: int, total: int, *samples: dict) -> dict:
+    return {"PartitionNumber": number, "TotalPartition": total, "Data": list(samples)}
+
+
+def test_Subscription_apply_delta_assembles_partitions() -> None:
+    subscription = Subscription("ref1")
+    subscription._setup(60, GetResp(Data=[sample(30, 1.0)], DataVersion=1))
+
+    assert subscription.apply_delta(parted(2, 3, sample(34, 1.4))) is None
+    assert subscription.apply_delta(parted(0, 3, sample(30, 1.05), sample(31, 1.1))) is None
+    snapshot = subscription.apply_delta(parted(1, 3, sample(32, 1.2), sample(33, 1.3)))
+    assert [s.CloseAsk for s in snapshot.Data] == [1.05, 1.1, 1.2, 1.3, 1.4]
+    assert snapshot.DataVersion == 1
+
+    snapshot = subscription.apply_delta({"Data": [sample(34, 1.45)], "DataVersion": 2})
+    assert [s.CloseAsk for s in snapshot.Data] == [1.05, 1.1, 1.2, 1.3, 1.45]
+    assert snapshot.DataVersion == 2
+
+
+def test_Subscription_apply_delta_assembles_raw_partitions() -> None:
+    subscription = Subscription("ref1", raw=True, list_key="Time")
+    subscription._setup(60, {"Data": [sample(30, 1.0)], "DataVersion": 1})
+
+    assert subscription.apply_delta(parted(1, 2, sample(31, 1.1))) is None
+    snapshot = subscription.apply_delta(parted(0, 2, sample(30, 1.05)))
+    assert snapshot.raw == {"Data": [sample(30, 1.05), sample(31, 1.1)], "DataVersion": 1}
+
+
+def test_Subscription_raw_updates_rows_of_model_snapshot() -> None:
+    subscription = Subscription("ref1", raw=True, list_key="Time")
+    subscription._setup(60, GetResp(Data=[sample(30, 1.0)], DataVersion=1))
+
+    # Rows of snapshot are keyed by time in the same form as the ones of deltas.
+    latest = subscription.apply_delta({"Data": [sample(30, 1.05)]})
+    assert latest.raw["Data"] == [sample(30, 1.05)]
+    assert [s.CloseAsk for s in latest.model.Data] == [1.05]
+
+
+def test_Subscription_apply_delta_expires_partitions() -> None:
+    subscription = Subscription("ref1")
+    subscription.partition_timeout = timedelta(seconds=-1)
+    subscription._setup(60, GetResp(Data=[], DataVersion=1))
+
+    assert subscription.apply_delta(parted(0, 2, sample(30, 1.0))) is None
+    # Previous set expired already, this one starts a new set.
+    assert subscription.apply_delta(parted(1, 2, sample(31, 1.1))) is None
+    assert subscription.expired_partitions == 1
+    assert subscription.snapshot.Data == []
+
+
+def test_Subscription_snapshot_rows_are_readonly() -> None:
+    subscription = Subscription("ref1")
+    subscription._setup(60, GetResp(Data=[sample(30, 1.0)], DataVersion=1))
+    first = subscription.snapshot
+
+    with pytest.raises(TypeError):
+        first.Data.append(ChartSample(**sample(31, 1.1)))
+    latest = subscription.apply_delta({"Data": [sample(31, 1.1)]})
+    with pytest.raises(TypeError):
+        latest.Data[0] = ChartSample(**sample(30, 1.05))
+    assert [s.CloseAsk for s in first.Data] == [1.0]
+    assert [s.CloseAsk for s in subscription.apply_delta({"Data": [sample(30, 1.05)]}).Data] == [
+        1.05,
+        1.1,
+    ]
+
+
+def test_Subscription_apply_delta_drops_partitions_superseded() -> None:
+    subscription = Subscription("ref1")
+    subscription._setup(60, GetResp(Data=[], DataVersion=1))
+
+    assert subscription.apply_delta(parted(0, 2, sample(30, 1.0))) is None
+    # Whole delta is newer than the partial set, which is never applied onto it.
+    snapshot = subscription.apply_delta({"Data": [sample(31, 1.1)], "DataVersion": 2})
+    assert subscription.apply_delta(parted(1, 2, sample(30, 1.05))) is None
+    assert [s.CloseAsk for s in snapshot.Data] == [1.1]
+    assert subscription.expired_partitions == 1
+
+
+def test_Subscription_apply_delta_rejects_partition_out_of_range() -> None:
+    subscription = Subscription("ref1")
+    subscription._setup(60, GetResp(Data=[], DataVersion=1))
+
+    with pytest.raises(InvalidPartitionError):
+        subscription.apply_delta(parted(3, 3, sample(30, 1.0)))
+    assert subscription.snapshot.Data == []
+
+
+def test_Subscriptions_expire_partitions() -> None:
+    target = subscriptions(2)
+    subscription = Subscription("ref0")
+    subscription._setup(60, GetResp(Data=[], DataVersion=1))
+    target.add(subscription)
+    subscription.apply_delta(parted(0, 2, sample(30, 1.0)))
+    now = datetime.now(timezone.utc)
+
+    assert target.expire_partitions(now) == set()
+    assert target.expire_partitions(now + timedelta(seconds=31)) == {"ref0"}
+    assert subscription.expired_partitions == 1
+    assert target.expire_partitions(now + timedelta(seconds=62)) == set()
+
+
+def test_merge_raw() -> None:
+    state = {"Quote": {"Ask": 1.0, "Bid": 0.9}, "Info": {"Uic": 21}}
+    merged = merge_raw(state, {"Quote": {"Bid": 0.95}})
+
+    assert merged == {"Quote": {"Ask": 1.0, "Bid": 0.95}, "Info": {"Uic": 21}}
+    assert merged["Info"] is state["Info"]
+    assert state["Quote"] == {"Ask": 1.0, "Bid": 0.9}
+
+    rows = [{"PositionId": "a", "Amount": 1}, {"PositionId": "b", "Amount": 2}]
+    delta = [
+        {"PositionId": "a", "__meta_deleted": True},
+        {"PositionId": "b", "Amount": 3},
+        {"PositionId": "c"},
+    ]
+    merged = merge_raw(rows, delta, "PositionId")
+    assert merged == [{"PositionId": "b", "Amount": 3}, {"PositionId": "c"}]
+    assert rows == [{"PositionId": "a", "Amount": 1}, {"PositionId": "b", "Amount": 2}]
+
+    # Positions by key are carried over, a row without key is appended.
+    merged = merge_raw(merged, [{"PositionId": "c", "Amount": 4}, {"Amount": 5}], "PositionId")
+    assert merged == [
+        {"PositionId": "b", "Amount": 3},
+        {"PositionId": "c", "Amount": 4},
+        {"Amount": 5},
+    ]
+    assert merged.positions == {"b": 0, "c": 1}
+
+
+def test_Subscription_raw_builds_model_lazily() -> None:
+    built = []
+
+    def factory(raw: dict) -> dict:
+        built.append(raw)
+        return raw
+
+    subscription = Subscription("ref1", raw=True)
+    subscription._setup(60, {"Quote": {"Ask": 1.0}})
+    subscription._snapshot._factory = factory
+
+    subscription.apply_delta({"Quote": {"Ask": 1.1}})
+    latest = subscription.apply_delta({"Quote": {"Ask": 1.2}})
+    assert built == []
+
+    assert latest.model == {"Quote": {"Ask": 1.2}}
+    assert latest.model is latest.model
+    assert len(built) == 1
+
+
+def test_Subscription_raw_builds_model_under_policy() -> None:
+    failures = []
+    policy = ValidationPolicy(
+        ValidationLevel.Sampled, sample_every=1, on_failure=lambda m, e: failures.append(e)
+    )
+    subscription = Subscription("ref1", raw=True, list_key="Time")
+    with use_validation_policy(policy):
+        subscription._setup(60, GetResp(Data=[sample(30, 1.0)], DataVersion=1))
+
+    # Model is built outside the context of setup, still under its policy.
+    latest = subscription.apply_delta({"Data": [dict(sample(31, 1.1), CloseAsk="x")]})
+    assert latest.model.Data[1].CloseAsk == "x"
+    assert len(failures) == 1
+
+
+def test_Subscription_pop_changes() -> None:
+    subscription = Subscription("ref1", raw=True, list_key="PositionId", track_changes=True)
+    subscription._setup(60, [{"PositionId": "a", "Amount": 1}, {"PositionId": "b", "Amount": 2}])
+
+    subscription.apply_delta([{"PositionId": "c"}, {"PositionId": "a", "Amount": 3}])
+    subscription.apply_delta(
+        [{"PositionId": "c", "__meta_deleted": True}, {"PositionId": "b", "__meta_deleted": True}]
+    )
+    changes = subscription.pop_changes()
+
+    assert (changes.inserted, changes.updated, changes.deleted) == (set(), {"a"}, {"b"})
+    assert not subscription.pop_changes()
+
+    subscription = Subscription("ref2", raw=True, track_changes=True)
+    subscription._setup(60, {"Quote": {"Bid": 0.9, "Ask": 1.0}, "Amount": 0})
+    subscription.apply_delta({"Quote": {"Bid": 1.0, "Ask": 1.1}, "Amount": 1})
+    assert subscription.pop_changes().paths == {("Quote", "Bid"), ("Quote", "Ask"), ("Amount",)}
+
+    # Changes are not tracked by default.
+    subscription = Subscription("ref3", raw=True)
+    subscription._setup(60, {"Amount": 0})
+    subscription.apply_delta({"Amount": 1})
+    assert subscription.pop_changes() is None
+
+
+def test_Subscription_pop_changes_of_model() -> None:
+    subscription = Subscription("ref1", track_changes=True)
+    subscription._setup(60, GetResp(Data=[sample(30, 1.0), sample(31, 1.1)], DataVersion=1))
+
+    subscription.apply_delta({"Data": [sample(31, 1.15), sample(32, 1.2)], "DataVersion": 2})
+    changes = subscription.pop_changes()
+
+    times = [s.Time for s in subscription.snapshot.Data]
+    assert (changes.inserted, changes.updated, changes.deleted) == ({times[2]}, {times[1]}, set())
+    assert changes.paths == {("Data",), ("DataVersion",)}
+
+
+def test_Subscription_chart_snapshot() -> None:
+    subscription = Subscription("ref1")
+    subscription._setup(60, GetResp(Data=[sample(31, 1.1), sample(32, 1.2)], DataVersion=1))
+
+    # The latest sample is updated and a new one is appended, the others are kept.
+    snapshot = subscription.apply_delta({"Data": [sample(32, 1.3), sample(33, 1.4)]})
+    assert [s.CloseAsk for s in snapshot.Data] == [1.1, 1.3, 1.4]
+    assert all(isinstance(s, ChartSample) for s in snapshot.Data)
+
+    with pytest.raises(FrozenInstanceError):
+        subscription.snapshot.DataVersion = 2
+    with pytest.raises(FrozenInstanceError):
+        subscription.snapshot.Data[0].CloseAsk = 2.0
@@ -0,0 +1,36 @@
+from dataclasses import dataclass
+
+import pytest
+
+from saxobank.model.base import SaxobankModel2
+from saxobank.validation import ValidationLevel, ValidationPolicy, use_validation_policy
+
+
+@dataclass
+class Sample(SaxobankModel2):
+    Price: float
+
+
+def test_strict_raises() -> None:
+    with pytest.raises(ValueError):
+        Sample(Price="1")
+
+
+def test_off_skips() -> None:
+    with use_validation_policy(ValidationPolicy(ValidationLevel.Off)):
+        assert Sample(Price="1").Price == "1"
+
+
+def test_sampled_reports() -> None:
+    failures = []
+    policy = ValidationPolicy(
+        ValidationLevel.Sampled, sample_every=3, on_failure=lambda m, e: failures.append(m)
+    )
+
+    with use_validation_policy(policy):
+        samples = [Sample(Price=str(i)) for i in range(7)]
+
+    # The first one and every 3rd one afterwards are validated.
+    assert failures == [samples[0], samples[3], samples[6]]
+    with pytest.raises(ValueError):
+        Sample(Price="1")